@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+""" Asyncio REST API Library with the same rest_call API as RestClient. """
+import asyncio
+import logging
+import json
+import time
+import requests
+from requests.structures import CaseInsensitiveDict
+from commons.constants import MAX_POOL_CONNECTIONS
+from commons.rest_client import log_request
+from commons.rest_client import log_response
+from commons.rest_client import decode_json
+from commons.http_metrics import RequestMetrics
+from commons.http_metrics import notify
+from commons.retry import RetryStats
+from commons.retry import make_policies
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def to_response(aio_response, body: bytes) -> requests.Response:
+    """
+    Convert an aiohttp response into a requests response so library callers
+    (decode_json, resp.text, resp.status_code) are shared with RestClient.
+    :param aio_response: aiohttp client response
+    :param body: payload read from aio_response
+    :return: requests response
+    """
+    response = requests.Response()
+    response.status_code = aio_response.status
+    response.reason = aio_response.reason
+    response.headers = CaseInsensitiveDict(aio_response.headers)
+    response.url = str(aio_response.url)
+    response.encoding = aio_response.charset
+    response._content = body
+    return response
+
+
+def _trace_config():
+    """
+    aiohttp tracing which fills the RequestMetrics passed as trace_request_ctx.
+    aiohttp does not split the TLS handshake from connect, tls stays zero.
+    """
+    trace = aiohttp.TraceConfig()
+
+    async def on_dns_start(session, ctx, params):
+        ctx.dns_start = time.perf_counter()
+
+    async def on_dns_end(session, ctx, params):
+        ctx.trace_request_ctx.dns += time.perf_counter() - ctx.dns_start
+
+    async def on_connect_start(session, ctx, params):
+        ctx.connect_start = time.perf_counter()
+        ctx.dns_before = ctx.trace_request_ctx.dns
+
+    async def on_connect_end(session, ctx, params):
+        metrics = ctx.trace_request_ctx
+        elapsed = time.perf_counter() - ctx.connect_start
+        metrics.connect += elapsed - (metrics.dns - ctx.dns_before)
+
+    async def on_request_end(session, ctx, params):
+        metrics = ctx.trace_request_ctx
+        metrics.ttfb = time.perf_counter() - metrics.attempt_start
+
+    trace.on_dns_resolvehost_start.append(on_dns_start)
+    trace.on_dns_resolvehost_end.append(on_dns_end)
+    trace.on_connection_create_start.append(on_connect_start)
+    trace.on_connection_create_end.append(on_connect_end)
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+
+class AsyncRestClient:
+    """
+        Rest Client implemented with aiohttp
+    """
+
+    def __init__(self, config: dict = None, session=None):
+        """
+        This function will initialize this class
+        :param config: configuration of setup. Optional keys are
+            max_pool_connections: concurrent connections per host (default 100)
+            log_payloads: decode response bodies for debug logs (default True)
+            retry_policy: default RetryPolicy or its kwargs (3 attempts of idempotent calls)
+            retry_policies: dict of method to RetryPolicy overriding the default
+        :param session: aiohttp.ClientSession to use instead of an owned one
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncRestClient needs aiohttp, install it with pip")
+        self.log = logging.getLogger(__name__)
+        self._config = config
+        self._pool_maxsize = int(self._config.get("max_pool_connections",
+                                                  MAX_POOL_CONNECTIONS))
+        self._owns_session = session is None
+        self.session = session
+        if not self._config.get("port"):
+            self._base_url = self._config["EP_FQDN"]
+        else:
+            self._base_url = "{}:{}".format(
+                self._config["EP_FQDN"], str(self._config["port"]))
+        self.verify_cert = self._config.get("verify_certificate")
+        self.log_payloads = self._config.get("log_payloads", True)
+        self.retry_policies = make_policies(self._config)
+        self.retry_stats = RetryStats()
+        self.listeners = list()
+
+    def add_listener(self, listener) -> None:
+        """Register a callable invoked with the RequestMetrics of every call of this client."""
+        self.listeners.append(listener)
+
+    def retry_policy(self, request_type: str):
+        """Retry policy of the request type."""
+        return self.retry_policies.get(request_type.lower(), self.retry_policies[None])
+
+    def _get_session(self):
+        """Create the owned session lazily, it has to be bound to the running loop."""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self._pool_maxsize,
+                                             limit_per_host=self._pool_maxsize,
+                                             ssl=False)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 trace_configs=[_trace_config()])
+        return self.session
+
+    async def rest_call(self, request_type, endpoint=None,
+                        data=None, headers=None, params=None, json_dict=None,
+                        save_json=False, name=None):
+        """
+        This coroutine will request REST methods like GET, POST ,PUT etc.
+        :param request_type: get/post/delete/update etc
+        :param endpoint: endpoint url
+        :param data: data required for REST call
+        :param headers: headers required for REST call
+        :param params: parameters required for REST call
+        :param save_json: In case user required to store json file
+        :param name: label of the call in request metrics, defaults to endpoint
+        :return: response of the request
+        """
+        debug = self.log.isEnabledFor(logging.DEBUG)
+        if debug:
+            log_request(self.log, self._base_url, request_type, headers, params, json_dict)
+        if data is not None:
+            data = json.dumps(data)
+        if debug:
+            self.log.debug("Data : %s", data)
+        if not endpoint:
+            endpoint = self._base_url
+        # aiohttp refuses data and json together, data wins as with requests
+        json_body = json_dict if data is None else None
+        metrics = RequestMetrics(request_type.lower(), endpoint, name or endpoint,
+                                 dns=0.0).begin(bind=False)
+        try:
+            response_object = await self._dispatch(metrics, request_type, endpoint, headers,
+                                                   data, params, json_body)
+        except Exception as error:
+            notify(metrics.end(error=error), self.listeners)
+            raise
+        response_object.metrics = metrics
+        # a prepared request sized by the shared request_size helper in metrics.end
+        response_object.request = requests.Request(
+            request_type.upper(), endpoint, headers=headers, params=params, data=data,
+            json=json_body).prepare()
+        metrics.end(response_object)
+        notify(metrics, self.listeners)
+        if debug:
+            log_response(self.log, response_object, self.log_payloads)
+
+        # Can be used in case of larger response
+        if save_json:
+            with open(self._json_file_path, 'w+') as json_file:
+                json_file.write(json.dumps(decode_json(response_object), indent=4))
+
+        return response_object
+
+    async def _dispatch(self, metrics, request_type, endpoint, headers, data, params,
+                        json_body):
+        """Send the request, transient failures are retried with backoff."""
+        policy = self.retry_policy(request_type)
+        attempt, retry_start = 0, None
+        while True:
+            attempt += 1
+            metrics.new_attempt()
+            try:
+                async with self._get_session().request(
+                        request_type.upper(), endpoint, headers=headers,
+                        data=data, params=params, json=json_body,
+                        trace_request_ctx=metrics) as aio_response:
+                    body = await aio_response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                if not policy.should_retry(request_type, attempt, error=error):
+                    raise
+                delay, reason = policy.backoff(attempt), error
+            else:
+                response_object = to_response(aio_response, body)
+                status = response_object.status_code
+                if not policy.should_retry(request_type, attempt, status=status):
+                    break
+                delay = policy.backoff(attempt, response_object.headers.get("Retry-After"))
+                reason = status
+            retry_start = retry_start or time.perf_counter()
+            self.log.warning("%s %s attempt %s failed with %s, retrying in %.2fs",
+                             request_type.upper(), endpoint, attempt, reason, delay)
+            await asyncio.sleep(delay)
+        retries = attempt - 1
+        retry_time = time.perf_counter() - retry_start if retries else 0.0
+        self.retry_stats.record(retries, retry_time)
+        response_object.retries = retries
+        response_object.retry_time = retry_time
+        return response_object
+
+    async def close(self) -> None:
+        """Release pooled connections of a session owned by this client."""
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
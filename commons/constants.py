@@ -8,9 +8,36 @@ they are coupled with the module/class.
 
 #: NWORKERS specifies number of worker (python) threads  in a worker pool.
 NWORKERS = 32
+#: WORKER_BATCH specifies maximum number of tasks a pool worker dequeues at once.
+#: Keep 1 for I/O bound tasks, larger batches only pay off for short tasks as
+#: a worker holding a batch of slow tasks leaves the other workers idle.
+WORKER_BATCH = 1
+#: WORKER_IDLE_TIMEOUT specifies seconds an autoscaled pool keeps an idle extra worker.
+WORKER_IDLE_TIMEOUT = 30
+#: WORKER_TARGET_WAIT specifies seconds a queued task may wait before an autoscaled pool grows.
+WORKER_TARGET_WAIT = 0.5
+#: PROCESS_CHUNKSIZE specifies tasks sent to a worker process at once.
+PROCESS_CHUNKSIZE = 64
+
+#: CHECKSUM_BUF_SIZE specifies bytes read and hashed at once by system_utils.calc_checksum.
+CHECKSUM_BUF_SIZE = 1024 * 1024
+#: S3_PART_SIZE specifies bytes per part of ranged downloads, the aws cli multipart default.
+S3_PART_SIZE = 8 * 1024 * 1024
+#: RANGE_WORKERS specifies byte ranges of an object downloaded at once.
+RANGE_WORKERS = 8
+#: MANIFEST_MEMORY_BUDGET specifies bytes of read buffers a manifest build uses at once.
+MANIFEST_MEMORY_BUDGET = 64 * 1024 * 1024
+
+#: MAX_POOL_CONNECTIONS specifies number of keep-alive connections cached per host by a
+#: RestClient session. Kept in sync with MAX_POOL_CONNECTIONS of perf/locust_config.ini.
+MAX_POOL_CONNECTIONS = 100
+#: POOL_HOSTS specifies number of per host connection pools cached by a RestClient session.
+POOL_HOSTS = 10
 
 LOCAL_S3_CERT_PATH = "/etc/ssl/clients/ca.crt"
 PIP_CONFIG = "/etc/pip.conf"
 
+#: CMD_KEEP_LINES specifies output lines of each stream cmd_utils.run_cmd keeps.
+CMD_KEEP_LINES = 100
 CREATE_FILE = "dd if={} of={} bs={} count={} iflag=fullblock"
 CMD_UMOUNT = "umount {}"
\ No newline at end of file
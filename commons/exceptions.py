@@ -40,3 +40,19 @@ class EncodingNotSupported(Exception):
     def __str__(self):
         """Representation of this exception."""
         return f"EncodingException: with Error Message {self.message}:"
+
+
+class DeadlineExceeded(Exception):
+    """Intended for use to fail worker pool tasks not started before their deadline."""
+
+    def __init__(self, msg=None) -> None:
+        """
+        Create a deadline exception
+        :param msg: String reason the task got dropped.
+        """
+        super().__init__(msg)
+        self.message = msg
+
+    def __str__(self):
+        """Representation of this exception."""
+        return f"DeadlineExceeded: {self.message}"
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+"""Per request timing and byte count instrumentation of the REST clients.
+
+A RequestMetrics record is filled for every rest_call and handed to the listeners
+registered globally with add_listener or on a client with client.add_listener.
+Connection phases are timed by urllib3 connection classes mounted with
+InstrumentedHTTPAdapter; a reused keep-alive connection reports zero connect and
+tls time. The requests client accounts name resolution in connect and leaves dns
+None, only the aiohttp client reports dns on its own. ttfb is counted from the
+start of the attempt which got the response, earlier attempts and their backoff
+are left out.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+from typing import List
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.connectionpool import HTTPSConnectionPool
+
+LOGGER = logging.getLogger(__name__)
+
+_CURRENT = threading.local()
+_LISTENERS = list()
+
+
+@dataclass
+class RequestMetrics:
+    """Timings in seconds and sizes in bytes of one rest call, dns None when unknown."""
+
+    method: str
+    url: str
+    name: str = None
+    status_code: int = None
+    dns: float = None
+    connect: float = 0.0
+    tls: float = 0.0
+    ttfb: float = 0.0
+    total: float = 0.0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    retries: int = 0
+    from_cache: bool = False
+    error: BaseException = None
+    start: float = 0.0
+    attempt_start: float = 0.0
+
+    def begin(self, bind: bool = True) -> "RequestMetrics":
+        """
+        Start the clock.
+        :param bind: make this the record of the calling thread for the timed connections,
+            coroutines sharing a thread pass False
+        """
+        self.start = self.attempt_start = time.perf_counter()
+        if bind:
+            _CURRENT.metrics = self
+        return self
+
+    def new_attempt(self) -> None:
+        """Count ttfb of the (re)try being sent from now."""
+        self.attempt_start = time.perf_counter()
+
+    def end(self, response=None, error: BaseException = None) -> "RequestMetrics":
+        """Stop the clock and account the final response or error."""
+        self.total = time.perf_counter() - self.start
+        if current() is self:
+            _CURRENT.metrics = None
+        self.error = error
+        if response is not None and not self.from_cache:
+            self.status_code = response.status_code
+            self.retries = getattr(response, "retries", 0)
+            self.request_bytes = request_size(response.request)
+            self.response_bytes = response_size(response)
+        elif response is not None:
+            self.status_code = response.status_code
+        return self
+
+
+def current() -> RequestMetrics:
+    """Metrics record of the rest call in progress on this thread, if any."""
+    return getattr(_CURRENT, "metrics", None)
+
+
+def _headers_size(headers) -> int:
+    """Bytes of header lines on the wire ('name: value' CRLF)."""
+    return sum(len(name) + len(str(value)) + 4 for name, value in headers.items())
+
+
+def request_size(request) -> int:
+    """Approximate bytes sent for a prepared request: request line, headers and body."""
+    if request is None:
+        return 0
+    body = request.body or b""
+    return len(request.method) + len(request.url) + 11 + _headers_size(request.headers) \
+        + len(body if isinstance(body, (bytes, str)) else b"")
+
+
+def response_size(response) -> int:
+    """Bytes received for a response: headers and the (possibly compressed) body."""
+    body = 0
+    raw = getattr(response, "raw", None)
+    if raw is not None and hasattr(raw, "tell"):
+        body = raw.tell()
+    if not body:
+        content = response.__dict__.get("_content")
+        body = len(content) if content else int(response.headers.get("Content-Length") or 0)
+    return _headers_size(response.headers) + body
+
+
+def add_listener(listener: Callable[[RequestMetrics], None]) -> None:
+    """Register a callable invoked with the RequestMetrics of every rest call."""
+    _LISTENERS.append(listener)
+
+
+def remove_listener(listener: Callable[[RequestMetrics], None]) -> None:
+    """Unregister a global listener."""
+    _LISTENERS.remove(listener)
+
+
+def notify(metrics: RequestMetrics, listeners: List[Callable] = ()) -> None:
+    """Hand metrics to the client listeners and the global ones, errors are logged."""
+    for listener in list(listeners) + _LISTENERS:
+        try:
+            listener(metrics)
+        except Exception as error:
+            LOGGER.exception("Metrics listener %s failed: %s", listener, error)
+
+
+class _TimedConnectionMixin:
+    """
+    Times opening a connection and time to first byte. Name resolution happens
+    inside urllib3's connect loop, so connect includes it and dns stays None.
+    """
+
+    def _new_conn(self):
+        metrics = current()
+        if metrics is None:
+            return super()._new_conn()
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            metrics.connect += time.perf_counter() - start
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        metrics = current()
+        if metrics is not None:
+            metrics.ttfb = time.perf_counter() - metrics.attempt_start
+        return response
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    """HTTP connection reporting to the current RequestMetrics."""
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    """HTTPS connection reporting TLS handshake time too."""
+
+    def connect(self):
+        metrics = current()
+        if metrics is None:
+            return super().connect()
+        before = metrics.connect
+        start = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - start
+        metrics.tls += max(0.0, elapsed - (metrics.connect - before))
+        return None
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class InstrumentedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools use the timed connection classes."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
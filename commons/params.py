@@ -11,5 +11,6 @@ CONFIG_DIR = 'config'
 LOG_DIR_NAME = 'log'
 LATEST_LOG_FOLDER = 'latest'
 LOG_DIR = os.path.join(SCRIPT_HOME, LOG_DIR_NAME)
+DURATIONS_FILE = os.path.join(LOG_DIR, 'durations.json')
 
 COMMON_CONFIG = os.path.join(CONFIG_DIR, 'common_config.yaml')
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""Response cache of idempotent GET calls for the REST clients."""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from urllib.parse import urlsplit
+
+import requests
+from requests.models import RequestEncodingMixin
+
+#: Methods invalidating cached responses of the resource they hit.
+WRITE_METHODS = frozenset({"post", "put", "patch", "delete"})
+
+
+class _Entry:
+    """Cached response with its expiry time and validator."""
+
+    __slots__ = ("response", "expires", "etag", "path")
+
+    def __init__(self, response, expires, etag, path):
+        self.response = response
+        self.expires = expires
+        self.etag = etag
+        self.path = path
+
+
+def _clone(response: requests.Response) -> requests.Response:
+    """Copy of a cached response which does not share the decoded body with others."""
+    clone = copy.copy(response)
+    clone.__dict__.pop("json_body", None)
+    return clone
+
+
+class ResponseCache:
+    """
+    Size bounded LRU cache of GET responses with a time to live.
+    Stale entries having an ETag are revalidated with If-None-Match.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0) -> None:
+        """
+        :param maxsize: maximum number of cached responses
+        :param ttl: seconds a response is served without asking the server
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.table = OrderedDict()
+        self.hits = self.misses = self.revalidations = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str, params: dict = None, headers: dict = None) -> tuple:
+        """
+        Cache key of a GET request, responses vary with params and Accept.
+        params are encoded as requests sends them (list values, list of tuples,
+        strings), the order of dict params does not matter.
+        """
+        accept = (headers or dict()).get("Accept")
+        if isinstance(params, Mapping):
+            params = sorted(params.items(), key=lambda item: str(item[0]))
+        return url, RequestEncodingMixin._encode_params(params or ""), accept
+
+    def lookup(self, key: tuple) -> tuple:
+        """
+        Lookup cache for key.
+        :param key: key from ResponseCache.key
+        :return: (response, etag) when fresh, (None, etag) when stale, (None, None) on miss
+        """
+        with self._lock:
+            entry = self.table.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            self.table.move_to_end(key)
+            if entry.expires > time.monotonic():
+                self.hits += 1
+                return _clone(entry.response), entry.etag
+            self.misses += 1
+            return None, entry.etag
+
+    def store(self, key: tuple, response: requests.Response) -> requests.Response:
+        """
+        Cache a successful response, or refresh the stale entry on 304 Not Modified.
+        :param key: key from ResponseCache.key
+        :param response: response of the GET call
+        :return: response to hand to the caller, None on 304 when the entry got
+            evicted meanwhile and the request has to be sent again unconditionally
+        """
+        now = time.monotonic()
+        with self._lock:
+            if response.status_code == 304:
+                entry = self.table.get(key)
+                if entry is None:
+                    return None
+                self.revalidations += 1
+                entry.expires = now + self.ttl
+                return _clone(entry.response)
+            if response.status_code != 200:
+                return response
+            self.table[key] = _Entry(response, now + self.ttl, response.headers.get("ETag"),
+                                     urlsplit(key[0]).path.rstrip("/"))
+            self.table.move_to_end(key)
+            while len(self.table) > self.maxsize:
+                self.table.popitem(last=False)
+        return _clone(response)
+
+    def invalidate(self, url: str) -> None:
+        """Drop cached responses of the resource at url and of the resources beneath it."""
+        path = urlsplit(url).path.rstrip("/")
+        with self._lock:
+            stale = [key for key, entry in self.table.items()
+                     if entry.path == path or entry.path.startswith(path + "/")]
+            for key in stale:
+                del self.table[key]
+
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        with self._lock:
+            self.table.clear()
@@ -4,41 +4,176 @@
 import logging
 import time
 import json
+import threading
 import requests
 from random import Random
 from string import Template
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
+from commons.constants import MAX_POOL_CONNECTIONS
+from commons.constants import POOL_HOSTS
+from commons.http_metrics import InstrumentedHTTPAdapter
+from commons.http_metrics import RequestMetrics
+from commons.http_metrics import notify
+from commons.response_cache import ResponseCache
+from commons.response_cache import WRITE_METHODS
+from commons.retry import RetryStats
+from commons.retry import make_policies
 
 SSL_REQ = "https://"
 NON_SSL = "http://"
 
+_SHARED_SESSIONS = dict()
+_SESSIONS_LOCK = threading.Lock()
+
+
+def new_session(pool_maxsize: int = MAX_POOL_CONNECTIONS,
+                pool_connections: int = POOL_HOSTS) -> requests.Session:
+    """
+    Create a keep-alive session backed by an instrumented connection pool.
+    :param pool_maxsize: number of connections kept alive per host
+    :param pool_connections: number of host pools cached by the session
+    :return: requests session
+    """
+    session = requests.Session()
+    adapter = InstrumentedHTTPAdapter(pool_connections=pool_connections,
+                                      pool_maxsize=pool_maxsize)
+    session.mount(SSL_REQ, adapter)
+    session.mount(NON_SSL, adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_shared_session(pool_maxsize: int = MAX_POOL_CONNECTIONS,
+                       pool_connections: int = POOL_HOSTS) -> requests.Session:
+    """
+    Get the process wide session for the pool size, creating it on first use.
+    All the RestClient instances asking for the same pool size share connections.
+    :param pool_maxsize: number of connections kept alive per host
+    :param pool_connections: number of host pools cached by the session
+    :return: requests session
+    """
+    key = (pool_maxsize, pool_connections)
+    with _SESSIONS_LOCK:
+        session = _SHARED_SESSIONS.get(key)
+        if session is None:
+            session = new_session(pool_maxsize, pool_connections)
+            _SHARED_SESSIONS[key] = session
+    return session
+
+
+def decode_json(response: requests.Response):
+    """
+    Decode the JSON body of a response once and cache it on the response object.
+    :param response: response returned by rest_call
+    :return: parsed JSON body
+    """
+    try:
+        return response.json_body
+    except AttributeError:
+        response.json_body = json.loads(response.text)
+    return response.json_body
+
+
+class _LazyJson:
+    """Defers json serialization of a log argument until the record is emitted."""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return json.dumps(self.obj)
+
+
+def log_request(log: logging.Logger, base_url: str, request_type: str,
+                headers: dict, params: dict, json_dict: dict) -> None:
+    """Debug log the request attributes, callers check the level first."""
+    log.debug("Request URL : %s", base_url)
+    log.debug("Request type : %s", request_type.upper())
+    log.debug("Request Header : %s", headers)
+    log.debug("Request Parameters : %s", params)
+    log.debug("json_dict: %s", _LazyJson(json_dict))
+
+
+def log_response(log: logging.Logger, response: requests.Response,
+                 log_payloads: bool = True) -> None:
+    """Debug log the response and its decoded body, callers check the level first."""
+    log.debug("Response Object: %s", response)
+    if log_payloads:
+        try:
+            log.debug("Response JSON: %s", decode_json(response))
+        except ValueError:
+            log.debug("Response Text: %s", response.text)
+
+
+def close_shared_sessions() -> None:
+    """Close all process wide sessions and release pooled connections."""
+    with _SESSIONS_LOCK:
+        for session in _SHARED_SESSIONS.values():
+            session.close()
+        _SHARED_SESSIONS.clear()
+
 
 class RestClient:
     """
         Rest Client implemented with requests
     """
 
-    def __init__(self, config: dict = None):
+    def __init__(self, config: dict = None, session: requests.Session = None):
         """
         This function will initialize this class
-        :param config: configuration of setup
+        :param config: configuration of setup. Optional keys are
+            max_pool_connections: keep-alive connections per host (default 100)
+            shared_session: use the process wide pool (default True)
+            log_payloads: decode response bodies for debug logs (default True)
+            retry_policy: default RetryPolicy or its kwargs (3 attempts of idempotent calls)
+            retry_policies: dict of method to RetryPolicy overriding the default
+            response_cache: ResponseCache (can be shared) or its kwargs to cache GETs
+        :param session: session to use instead of the configured one
         """
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
         self.log = logging.getLogger(__name__)
         self._config = config
-        self._request = {"get": requests.get, "post": requests.post,
-                         "patch": requests.patch, "delete": requests.delete,
-                         "put": requests.put}
+        pool_maxsize = int(self._config.get("max_pool_connections",
+                                            MAX_POOL_CONNECTIONS))
+        self._owns_session = False
+        if session is None:
+            if self._config.get("shared_session", True):
+                session = get_shared_session(pool_maxsize)
+            else:
+                session = new_session(pool_maxsize)
+                self._owns_session = True
+        self.session = session
+        self._request = {"get": session.get, "post": session.post,
+                         "patch": session.patch, "delete": session.delete,
+                         "put": session.put}
         if not self._config.get("port"):
             self._base_url = self._config["EP_FQDN"]
         else:
             self._base_url = "{}:{}".format(
                 self._config["EP_FQDN"], str(self._config["port"]))
         self.verify_cert = self._config.get("verify_certificate")
+        self.log_payloads = self._config.get("log_payloads", True)
+        self.retry_policies = make_policies(self._config)
+        self.retry_stats = RetryStats()
+        cache = self._config.get("response_cache")
+        if isinstance(cache, dict):
+            cache = ResponseCache(**cache)
+        self.cache = cache
+        self.listeners = list()
+
+    def add_listener(self, listener) -> None:
+        """Register a callable invoked with the RequestMetrics of every call of this client."""
+        self.listeners.append(listener)
+
+    def retry_policy(self, request_type: str):
+        """Retry policy of the request type."""
+        return self.retry_policies.get(request_type.lower(), self.retry_policies[None])
 
     def rest_call(self, request_type, endpoint=None,
                   data=None, headers=None, params=None, json_dict=None,
-                  save_json=False):
+                  save_json=False, stream=False, name=None):
         """
         This function will request REST methods like GET, POST ,PUT etc.
         :param request_type: get/post/delete/update etc
@@ -48,32 +183,103 @@ class RestClient:
         :param headers: headers required for REST call
         :param params: parameters required for REST call
         :param save_json: In case user required to store json file
+        :param stream: Defer reading the body, caller iterates and closes the response
+        :param name: label of the call in request metrics, defaults to endpoint
         :return: response of the request
         """
         # Building final endpoint request url
-        self.log.debug("Request URL : %s", self._base_url)
-        self.log.debug("Request type : %s", request_type.upper())
-        self.log.debug("Request Header : %s", headers)
-        self.log.debug("Request Parameters : %s", params)
-        self.log.debug("json_dict: %s", json.dumps(json_dict))
-        data = json.dumps(data)
-        self.log.debug("Data : %s", data)
+        debug = self.log.isEnabledFor(logging.DEBUG)
+        if debug:
+            log_request(self.log, self._base_url, request_type, headers, params, json_dict)
+        if data is not None:
+            data = json.dumps(data)
+        if debug:
+            self.log.debug("Data : %s", data)
         if not endpoint:
             endpoint = self._base_url
-        # Request a REST call and retries can be added with backoff
-        response_object = self._request[request_type](
-            endpoint, headers=headers,
-            data=data, params=params, verify=False, json=json_dict)
-        self.log.debug("Response Object: %s", response_object)
+        metrics = RequestMetrics(request_type.lower(), endpoint, name or endpoint).begin()
         try:
-            self.log.debug("Response JSON: %s", response_object.json())
-        except Exception:   # can base http exception raised by request
-            self.log.exception("Response Text: %s", response_object.text)
+            response_object = self._cached_dispatch(metrics, request_type, endpoint, headers,
+                                                    data, params, json_dict, stream)
+        except Exception as error:
+            notify(metrics.end(error=error), self.listeners)
+            raise
+        response_object.metrics = metrics
+        notify(metrics.end(response_object), self.listeners)
+        if debug:
+            log_response(self.log, response_object, self.log_payloads and not stream)
 
         # Can be used in case of larger response
         if save_json:
             with open(self._json_file_path, 'w+') as json_file:
-                json_file.write(json.dumps(response_object.json(), indent=4))
+                json_file.write(json.dumps(decode_json(response_object), indent=4))
+
+        return response_object
+
+    def _cached_dispatch(self, metrics, request_type, endpoint, headers, data, params,
+                         json_dict, stream):
+        """Serve GETs from the response cache if enabled, otherwise dispatch them."""
+        cache_key, etag = None, None
+        if self.cache is not None and not stream and request_type.lower() == "get":
+            cache_key = self.cache.key(endpoint, params, headers)
+            response_object, etag = self.cache.lookup(cache_key)
+            if response_object is not None:
+                self.log.debug("Response from cache: %s", endpoint)
+                metrics.from_cache = True
+                return response_object
+        conditional = dict(headers or dict(), **{"If-None-Match": etag}) if etag else headers
+        response_object = self._dispatch(metrics, request_type, endpoint, conditional, data,
+                                         params, json_dict, stream)
+        if cache_key is not None:
+            cached = self.cache.store(cache_key, response_object)
+            if cached is None:
+                # 304 of an entry evicted since the lookup, ask for the body again
+                self.log.debug("Cached response of %s evicted, requesting it again", endpoint)
+                response_object = self._dispatch(metrics, request_type, endpoint, headers,
+                                                 data, params, json_dict, stream)
+                cached = self.cache.store(cache_key, response_object) or response_object
+            response_object = cached
+        elif self.cache is not None and request_type.lower() in WRITE_METHODS and \
+                200 <= response_object.status_code < 300:
+            self.cache.invalidate(endpoint)
+        return response_object
 
+    def _dispatch(self, metrics, request_type, endpoint, headers, data, params, json_dict,
+                  stream):
+        """Send the request, transient failures are retried with backoff."""
+        policy = self.retry_policy(request_type)
+        attempt, retry_start = 0, None
+        while True:
+            attempt += 1
+            metrics.new_attempt()
+            try:
+                response_object = self._request[request_type](
+                    endpoint, headers=headers,
+                    data=data, params=params, verify=False, json=json_dict, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if not policy.should_retry(request_type, attempt, error=error):
+                    raise
+                delay, reason = policy.backoff(attempt), error
+            else:
+                status = response_object.status_code
+                if not policy.should_retry(request_type, attempt, status=status):
+                    break
+                delay = policy.backoff(attempt, response_object.headers.get("Retry-After"))
+                reason = status
+                response_object.close()
+            retry_start = retry_start or time.perf_counter()
+            self.log.warning("%s %s attempt %s failed with %s, retrying in %.2fs",
+                             request_type.upper(), endpoint, attempt, reason, delay)
+            time.sleep(delay)
+        retries = attempt - 1
+        retry_time = time.perf_counter() - retry_start if retries else 0.0
+        self.retry_stats.record(retries, retry_time)
+        response_object.retries = retries
+        response_object.retry_time = retry_time
         return response_object
 
+    def close(self) -> None:
+        """Release pooled connections of a session owned by this client."""
+        if self._owns_session:
+            self.session.close()
+
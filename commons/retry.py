@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""Retry policies with exponential backoff and jitter for the REST clients."""
+
+import threading
+from dataclasses import dataclass
+from dataclasses import field
+from random import Random
+from typing import FrozenSet
+
+#: Methods which can be repeated without changing the result on the server.
+IDEMPOTENT_METHODS = frozenset({"get", "head", "options", "put", "delete"})
+#: Status codes of a transient gateway/server failure.
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+_RANDOM = Random()
+
+
+@dataclass
+class RetryPolicy:
+    """Decides whether a failed attempt is retried and how long to back off."""
+
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_cap: float = 10.0
+    jitter: bool = True
+    retry_statuses: FrozenSet[int] = RETRY_STATUSES
+    retry_non_idempotent: bool = False
+
+    def should_retry(self, method: str, attempt: int, status: int = None,
+                     error: Exception = None) -> bool:
+        """
+        Check if the attempt which failed with status or error is to be retried.
+        :param method: get/post/put etc
+        :param attempt: number of the attempt which just completed, starting with 1
+        :param status: HTTP status code of the response
+        :param error: connection or timeout error raised by the attempt
+        :return: True to retry
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if method.lower() not in IDEMPOTENT_METHODS and not self.retry_non_idempotent:
+            return False
+        return error is not None or status in self.retry_statuses
+
+    def backoff(self, attempt: int, retry_after: str = None) -> float:
+        """
+        Seconds to wait before the next attempt, exponential in attempt and capped.
+        With jitter the delay is drawn uniformly from [0, delay] (full jitter).
+        A numeric Retry-After header is honoured up to the cap.
+        :param attempt: number of the attempt which just completed, starting with 1
+        :param retry_after: value of the Retry-After response header
+        :return: delay in seconds
+        """
+        delay = min(self.backoff_cap, self.backoff_base * (2 ** (attempt - 1)))
+        if self.jitter:
+            delay = _RANDOM.uniform(0, delay)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(self.backoff_cap, float(retry_after)))
+        return delay
+
+
+#: Policy which never retries.
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+def make_policies(config: dict) -> dict:
+    """
+    Build per method retry policies from a client configuration.
+    config["retry_policy"] is the default policy (RetryPolicy or its kwargs) and
+    config["retry_policies"] maps a method name to its own policy.
+    :param config: client configuration
+    :return: dict of method to RetryPolicy, the default one is keyed by None
+    """
+    def _policy(value):
+        return value if isinstance(value, RetryPolicy) else RetryPolicy(**value)
+
+    policies = {None: _policy(config.get("retry_policy") or RetryPolicy())}
+    for method, value in (config.get("retry_policies") or dict()).items():
+        policies[method.lower()] = _policy(value)
+    return policies
+
+
+@dataclass
+class RetryStats:
+    """Thread safe counters of retried calls for reporting."""
+
+    calls: int = 0
+    retried_calls: int = 0
+    retries: int = 0
+    retry_time: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, retries: int, retry_time: float) -> None:
+        """
+        Account one rest call.
+        :param retries: number of retried attempts of the call
+        :param retry_time: seconds spent from the first failed attempt till the last one
+        """
+        with self._lock:
+            self.calls += 1
+            if retries:
+                self.retried_calls += 1
+                self.retries += retries
+                self.retry_time += retry_time
+
+    def as_dict(self) -> dict:
+        """Snapshot of the counters."""
+        with self._lock:
+            return dict(calls=self.calls, retried_calls=self.retried_calls,
+                        retries=self.retries, retry_time=self.retry_time)
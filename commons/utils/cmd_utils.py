@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""Run local commands concurrently with asyncio, streaming their output.
+
+Output lines go to a callback (or the debug log) as the command prints them
+and only the last keep_lines lines of each stream are kept in the result, so
+that long running or chatty commands do not pile up in memory.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import shlex
+import signal
+import time
+from collections import deque
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Callable
+from typing import List
+from typing import Sequence
+from typing import Union
+
+from commons import constants
+
+LOGGER = logging.getLogger(__name__)
+
+#: Seconds a command gets to exit after SIGTERM before it is killed.
+KILL_GRACE = 5.0
+#: Longest output line read at once, longer lines are split.
+_LINE_LIMIT = 1024 * 1024
+
+
+@dataclass
+class CmdResult:
+    """Outcome of a command, stdout and stderr hold the last kept lines."""
+
+    cmd: Union[str, Sequence[str]]
+    returncode: int = None
+    stdout: List[str] = field(default_factory=list)
+    stderr: List[str] = field(default_factory=list)
+    timed_out: bool = False
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+def _log_line(stream: str, line: str) -> None:
+    LOGGER.debug("%s: %s", stream, line)
+
+
+async def _pump(reader: asyncio.StreamReader, stream: str, on_line: Callable,
+                kept: deque) -> None:
+    """Hand every line of reader to on_line, keeping the last ones in kept."""
+    while True:
+        try:
+            raw = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as error:
+            # last line without a newline
+            raw = error.partial
+        except asyncio.LimitOverrunError as error:
+            # line longer than the limit, hand over the buffered part, unlike
+            # readline() readuntil() leaves it in the buffer on overrun
+            raw = await reader.readexactly(error.consumed)
+        if not raw:
+            break
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        kept.append(line)
+        result = on_line(stream, line)
+        if inspect.isawaitable(result):
+            await result
+
+
+def _signal(proc, sig: int) -> None:
+    """Signal the process group of proc so that children of a shell stop too."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, sig)
+        else:
+            proc.send_signal(sig)
+    except ProcessLookupError:
+        pass
+
+
+async def _stop(proc) -> None:
+    """Terminate a running proc, kill it when it outlives KILL_GRACE."""
+    if proc.returncode is not None:
+        return
+    _signal(proc, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(proc.wait(), KILL_GRACE)
+    except asyncio.TimeoutError:
+        _signal(proc, getattr(signal, "SIGKILL", signal.SIGTERM))
+        await proc.wait()
+
+
+async def run_cmd(cmd: Union[str, Sequence[str]], on_line: Callable = None,
+                  timeout: float = None, env: dict = None, cwd: str = None,
+                  shell: bool = None, keep_lines: int = constants.CMD_KEEP_LINES) -> CmdResult:
+    """
+    Run a command, streaming its output lines as they come.
+    :param cmd: argv list run without a shell, or a command string
+    :param on_line: callable (or coroutine function) taking the stream name
+        'stdout'/'stderr' and the line, defaults to the debug log
+    :param timeout: seconds after which the command is terminated
+    :param env: environment of the command
+    :param cwd: working directory of the command
+    :param shell: run a command string through the shell, default True for strings;
+        False splits it into an argv list
+    :param keep_lines: output lines of each stream kept in the result, None keeps all
+    :return: CmdResult
+    """
+    on_line = on_line or _log_line
+    result = CmdResult(cmd, stdout=deque(maxlen=keep_lines), stderr=deque(maxlen=keep_lines))
+    LOGGER.debug("Command: %s", cmd)
+    start = time.perf_counter()
+    options = dict(stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=env,
+                   cwd=cwd, limit=_LINE_LIMIT, start_new_session=hasattr(os, "killpg"))
+    if isinstance(cmd, str) and shell is not False:
+        proc = await asyncio.create_subprocess_shell(cmd, **options)  # nosec (B604)
+    else:
+        argv = shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
+        proc = await asyncio.create_subprocess_exec(*argv, **options)
+
+    async def _communicate():
+        await asyncio.gather(_pump(proc.stdout, "stdout", on_line, result.stdout),
+                             _pump(proc.stderr, "stderr", on_line, result.stderr))
+        return await proc.wait()
+
+    communicate = asyncio.ensure_future(_communicate())
+    try:
+        result.returncode = await asyncio.wait_for(asyncio.shield(communicate), timeout)
+    except asyncio.TimeoutError:
+        result.timed_out = True
+        LOGGER.warning("Command timed out after %ss: %s", timeout, cmd)
+        await _stop(proc)
+        result.returncode = proc.returncode
+        try:
+            # output already buffered in the pipes
+            await asyncio.wait_for(communicate, KILL_GRACE)
+        except asyncio.TimeoutError:
+            pass
+    except BaseException:
+        # cancelled, or on_line/a pump failed: never leave the command running
+        communicate.cancel()
+        await _stop(proc)
+        raise
+    result.duration = time.perf_counter() - start
+    result.stdout, result.stderr = list(result.stdout), list(result.stderr)
+    return result
+
+
+async def run_cmds(cmds: Sequence[Union[str, Sequence[str]]],
+                   concurrency: int = constants.NWORKERS, **kwargs) -> List[CmdResult]:
+    """
+    Run commands concurrently, at most concurrency at a time.
+    :param cmds: commands of run_cmd
+    :param kwargs: more arguments of run_cmd
+    :return: CmdResult per command, in the order of cmds
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run(cmd):
+        async with semaphore:
+            return await run_cmd(cmd, **kwargs)
+
+    return list(await asyncio.gather(*[_run(cmd) for cmd in cmds]))
+
+
+def run_commands(cmds: Sequence[Union[str, Sequence[str]]], **kwargs) -> List[CmdResult]:
+    """run_cmds for synchronous callers, which must not be inside a running event loop."""
+    return asyncio.run(run_cmds(cmds, **kwargs))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""Checksum manifests of directory trees, e.g. to verify test datasets.
+
+A manifest is a JSON file holding the hash algorithm and, per file relative to
+the root, its size, mtime (nanoseconds) and digest. Rebuilding a manifest only
+hashes the files whose size or mtime changed since the previous one. A file
+which could not be hashed, or changed while it was, has no digest and an error.
+"""
+
+import logging
+import os
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import Tuple
+
+from commons import constants
+from commons.utils import config_utils
+from commons.utils import system_utils
+from commons.worker import Workers
+
+LOGGER = logging.getLogger(__name__)
+
+
+def walk_files(root: str, exclude: Iterable[str] = ()) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Yield (path relative to root, stat) of the regular files below root.
+    :param exclude: paths of files to skip, e.g. the manifest itself
+    """
+    exclude = {os.path.abspath(path) for path in exclude}
+    dirs = [root]
+    while dirs:
+        with os.scandir(dirs.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and \
+                        os.path.abspath(entry.path) not in exclude:
+                    yield os.path.relpath(entry.path, root), entry.stat(follow_symlinks=False)
+
+
+def load_manifest(path: str) -> dict:
+    """Manifest saved by build_manifest, an empty one when the file is missing or bad."""
+    if not path or not os.path.exists(path):
+        return dict(algo=None, files=dict())
+    try:
+        return config_utils.read_content_json(path)
+    except ValueError as error:
+        LOGGER.warning("Ignoring unreadable manifest %s: %s", path, error)
+        return dict(algo=None, files=dict())
+
+
+def _hash_file(path: str, entry: dict, hash_algo: str, buf_size: int) -> dict:
+    """
+    Hash a file of the walk, the entry is stat'ed again afterwards.
+    :return: entry with its digest or an error, None when the file vanished
+    """
+    try:
+        # readinto keeps one buf_size buffer per file, mmap would not honour the budget
+        digest = system_utils.calc_checksum(path, hash_algo, buf_size, use_mmap=False)
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    except OSError as error:
+        LOGGER.warning("Cannot hash %s: %s", path, error)
+        return dict(entry, error=str(error))
+    if digest is None:
+        return None
+    if (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime"]):
+        LOGGER.warning("%s changed while it was hashed", path)
+        return dict(size=stat.st_size, mtime=stat.st_mtime_ns, digest=None,
+                    error="changed while hashed")
+    return dict(entry, digest=digest)
+
+
+def build_manifest(root: str, manifest_path: str = None, hash_algo: str = 'md5',
+                   nworkers: int = constants.NWORKERS,
+                   memory_budget: int = constants.MANIFEST_MEMORY_BUDGET,
+                   buf_size: int = constants.CHECKSUM_BUF_SIZE) -> Dict[str, dict]:
+    """
+    Hash the files below root on a worker pool and save the manifest.
+    Digests of the previous manifest at manifest_path are reused for files
+    whose size and mtime did not change.
+    :param root: directory to walk
+    :param manifest_path: manifest to reuse and overwrite, None to only return it
+    :param hash_algo: algorithm of system_utils.HASH_ALGOS
+    :param nworkers: maximum files hashed at once
+    :param memory_budget: bytes of read buffers in use at once, limits nworkers
+        to memory_budget // buf_size
+    :param buf_size: read buffer of one file
+    :return: dict of relative path to dict(size, mtime, digest), plus error when
+        digest is None; files removed during the build are left out
+    """
+    system_utils.new_hashes(hash_algo)  # fail early on an unsupported algorithm
+    previous = load_manifest(manifest_path)
+    old_files = previous["files"] if previous.get("algo") == hash_algo else dict()
+    files, todo = dict(), list()
+    # a manifest saved inside root must not list itself
+    exclude = (manifest_path, manifest_path + '.tmp') if manifest_path else ()
+    for rel_path, stat in walk_files(root, exclude):
+        entry = dict(size=stat.st_size, mtime=stat.st_mtime_ns, digest=None)
+        old = old_files.get(rel_path)
+        if old and old["digest"] and old["size"] == entry["size"] and \
+                old["mtime"] == entry["mtime"]:
+            entry["digest"] = old["digest"]
+        else:
+            todo.append(rel_path)
+        files[rel_path] = entry
+    reused = len(files) - len(todo)
+    if todo:
+        nworkers = max(1, min(nworkers, memory_budget // buf_size, len(todo)))
+        workers = Workers()
+        workers.start_workers(nworkers)
+        with workers:
+            entries = workers.map(lambda rel_path, entry: _hash_file(
+                os.path.join(root, rel_path), entry, hash_algo, buf_size),
+                                  todo, [files[rel_path] for rel_path in todo])
+            for rel_path, entry in zip(todo, entries):
+                if entry is None:
+                    del files[rel_path]
+                else:
+                    files[rel_path] = entry
+    errors = sum(1 for entry in files.values() if entry["digest"] is None)
+    LOGGER.info("Manifest of %s: %s files, %s hashed, %s reused, %s errors", root,
+                len(files), len(todo), reused, errors)
+    if manifest_path:
+        tmp_path = manifest_path + '.tmp'
+        config_utils.create_content_json(tmp_path, dict(algo=hash_algo, files=files))
+        os.replace(tmp_path, manifest_path)
+    return files
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""InMemoryDB API on an sqlite file, to resume soak tests and share entities.
+
+Values are stored as JSON. A hot InMemoryDB tier serves recent entries from
+memory and writes reach the file in batches, so that a run reopening the file
+(or another locust worker process) finds the entities created before, e.g. to
+clean them up.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from collections.abc import Mapping
+from typing import Any
+from typing import Callable
+
+from commons.utils.system_utils import InMemoryDB
+
+LOGGER = logging.getLogger(__name__)
+
+#: Pending value of a key deleted since the last flush.
+_DELETED = object()
+
+
+def _default(value: Any) -> Any:
+    """JSON encode Mappings which are not dicts, like record_utils records."""
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError("{!r} is not JSON serializable".format(value))
+
+
+class PersistentDB:
+    """
+    InMemoryDB backed by an sqlite file with batched write through. Processes
+    sharing the file see each other's entries once flushed, except for the
+    copies already in their hot tier.
+    """
+
+    def __init__(self, path: str, size: int = 1024 * 64, batch_size: int = 256,
+                 decode: Callable = None, timeout: float = 30.0) -> None:
+        """
+        :param path: sqlite file, created when missing
+        :param size: number of entries of the hot in memory tier
+        :param batch_size: pending writes after which they are flushed to the file
+        :param decode: callable applied to values read back from the file, e.g. a record class
+        :param timeout: seconds to wait for the file lock held by another process
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.decode = decode
+        self.hot = InMemoryDB(size)
+        self._pending = dict()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries "
+                           "(key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _load(self, value: str) -> Any:
+        value = json.loads(value)
+        return self.decode(value) if self.decode is not None else value
+
+    def store(self, key: str, value: Any) -> None:
+        """Store the key and value, written to the file with the next batch."""
+        with self._lock:
+            self.hot.store(key, value)
+            self._pending[key] = value
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def lookup(self, key: str) -> Any:
+        """
+        Lookup the hot tier, then the file.
+        :raises KeyError: when the key is not stored
+        """
+        with self._lock:
+            try:
+                return self.hot.lookup(key)
+            except KeyError:
+                pass
+            if key in self._pending:
+                value = self._pending[key]
+                if value is _DELETED:
+                    raise KeyError(key)
+            else:
+                row = self._conn.execute("SELECT value FROM entries WHERE key = ?",
+                                         (json.dumps(key),)).fetchone()
+                if row is None:
+                    raise KeyError(key)
+                value = self._load(row[0])
+            self.hot.store(key, value)
+            return value
+
+    def peek(self, key: str) -> Any:
+        """Same as lookup, for callers written against ShardedCache."""
+        return self.lookup(key)
+
+    def delete(self, key: str) -> None:
+        """Removes the entry, from the file with the next batch."""
+        with self._lock:
+            self.hot.delete(key)
+            self._pending[key] = _DELETED
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def pop_one(self) -> tuple:
+        """
+        Pop one entry randomly, from the hot tier while it has entries, else
+        from the file. The entry is deleted from the file right away, so that
+        processes sharing the file never pop the same one.
+        :return: key, value or False, False when empty
+        """
+        with self._lock:
+            while True:
+                key, value = self.hot.pop_one()
+                if key is False:
+                    break
+                unflushed = self._pending.pop(key, _DELETED) is not _DELETED
+                deleted = self._conn.execute("DELETE FROM entries WHERE key = ?",
+                                             (json.dumps(key),)).rowcount
+                if deleted or unflushed:
+                    return key, value
+                # popped from the file by another process meanwhile
+            self.flush()
+            with self._conn:
+                # select and delete in one write transaction, OFFSET picks any row
+                # with the same odds unlike a random rowid which favours rows after gaps
+                self._conn.execute("BEGIN IMMEDIATE")
+                row = self._conn.execute(
+                    "SELECT key, value FROM entries LIMIT 1 OFFSET abs(random()) % "
+                    "max((SELECT count(*) FROM entries), 1)").fetchone()
+                if row is None:
+                    return False, False
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            return json.loads(row[0]), self._load(row[1])
+
+    def flush(self) -> None:
+        """Write the pending stores and deletes to the file in one transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, dict()
+            upserts = [(json.dumps(key), json.dumps(value, default=_default))
+                       for key, value in pending.items() if value is not _DELETED]
+            deletes = [(json.dumps(key),) for key, value in pending.items()
+                       if value is _DELETED]
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("INSERT OR REPLACE INTO entries (key, value) "
+                                       "VALUES (?, ?)", upserts)
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", deletes)
+            LOGGER.debug("flushed %s stores and %s deletes to %s", len(upserts),
+                         len(deletes), self.path)
+
+    def get_keys(self) -> list:
+        """Keys of all entries, read from the file."""
+        with self._lock:
+            self.flush()
+            return [json.loads(row[0]) for row in self._conn.execute("SELECT key FROM entries")]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.flush()
+            return self._conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    def close(self) -> None:
+        """Flush pending writes and close the file."""
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
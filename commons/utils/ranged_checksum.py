@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+"""Checksums of remote objects computed from byte ranges downloaded concurrently.
+
+Every part is hashed on its own while the parts download on a worker pool, so
+the digest is a composite: the hash of the concatenated binary part digests
+followed by "-<number of parts>". With md5 and the part size of the upload this
+is the ETag S3 gives a multipart object. A plain digest of the whole object
+cannot be computed in parallel since md5/sha chain over the full content.
+"""
+
+import hashlib
+import logging
+import math
+from abc import ABC
+from abc import abstractmethod
+from typing import List
+
+import requests
+
+from commons import constants
+from commons.utils import system_utils
+from commons.worker import Workers
+
+LOGGER = logging.getLogger(__name__)
+
+#: Unit aws cli and boto3 round multipart part sizes to.
+_MIB = 1024 * 1024
+
+
+class RangeFetcher(ABC):
+    """Source of an object readable by byte ranges."""
+
+    @abstractmethod
+    def size(self) -> int:
+        """Object size in bytes."""
+
+    @abstractmethod
+    def open_range(self, start: int, end: int):
+        """
+        Stream of the bytes start to end, both included.
+        :return: object with read(amt) or readinto(buffer), and close()
+        """
+
+
+class S3RangeFetcher(RangeFetcher):
+    """Ranged get_object of a boto3 S3 client."""
+
+    def __init__(self, s3_client, bucket: str, key: str) -> None:
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+
+    def size(self) -> int:
+        return self.s3_client.head_object(Bucket=self.bucket, Key=self.key)["ContentLength"]
+
+    def open_range(self, start: int, end: int):
+        return self.s3_client.get_object(Bucket=self.bucket, Key=self.key,
+                                         Range="bytes={}-{}".format(start, end))["Body"]
+
+
+class _DecodedBody:
+    """read() over the content decoded chunks of a streamed requests response."""
+
+    def __init__(self, response: requests.Response, chunk_size: int) -> None:
+        self._response = response
+        self._chunks = response.iter_content(chunk_size)
+
+    def read(self, amt: int = None) -> bytes:
+        return next(self._chunks, b"")
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class HTTPRangeFetcher(RangeFetcher):
+    """Ranged GET of a URL, the server must answer 206 Partial Content."""
+
+    def __init__(self, url: str, session: requests.Session = None, headers: dict = None,
+                 timeout: float = 60) -> None:
+        self.url = url
+        self.session = session or requests.Session()
+        self.headers = headers or dict()
+        self.timeout = timeout
+
+    def size(self) -> int:
+        resp = self.session.head(self.url, headers=self.headers, timeout=self.timeout)
+        resp.raise_for_status()
+        return int(resp.headers["Content-Length"])
+
+    def open_range(self, start: int, end: int):
+        # ask for the bytes as stored, a server compressing anyway is decoded
+        headers = dict({"Accept-Encoding": "identity"}, **self.headers)
+        headers["Range"] = "bytes={}-{}".format(start, end)
+        resp = self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout)
+        resp.raise_for_status()
+        if resp.status_code != 206:
+            resp.close()
+            raise ValueError("{} ignored the Range request with status {}".format(
+                self.url, resp.status_code))
+        return _DecodedBody(resp, constants.CHECKSUM_BUF_SIZE)
+
+
+def part_ranges(size: int, part_size: int) -> List[tuple]:
+    """(start, end) byte ranges, end included, of parts of part_size covering size bytes."""
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+def part_sizes_from_etag(etag: str, size: int, part_size: int = None) -> List[int]:
+    """
+    Part sizes of a multipart upload consistent with its ETag "<hex>-<parts>".
+    Uploaders use a fixed part size: part_size when given, S3_PART_SIZE and the
+    power of two MiB sizes are tried first, size / parts rounded up to whole MiB last.
+    :param part_size: part size of the upload when known
+    :return: candidate part sizes giving the ETag part count, [size] for a plain ETag
+    """
+    etag = etag.strip('"')
+    if '-' not in etag:
+        return [size]
+    nparts = int(etag.rsplit('-', 1)[1])
+    if nparts <= 1:
+        return [size]
+    candidates = [part_size] if part_size else list()
+    candidates += [constants.S3_PART_SIZE] + [_MIB << shift for shift in range(3, 13)]
+    candidates.append(math.ceil(size / nparts / _MIB) * _MIB)
+    found = list()
+    for candidate in candidates:
+        if candidate and math.ceil(size / candidate) == nparts and candidate not in found:
+            found.append(candidate)
+    return found
+
+
+def _hash_part(fetcher: RangeFetcher, start: int, end: int, hash_algo: str,
+               buf_size: int) -> bytes:
+    """Binary digest of one part."""
+    hashes = system_utils.new_hashes(hash_algo)
+    stream = fetcher.open_range(start, end)
+    try:
+        nbytes = system_utils.hash_stream(stream, hashes, buf_size)
+    finally:
+        stream.close()
+    if nbytes != end - start + 1:
+        raise IOError("part {}-{} returned {} bytes".format(start, end, nbytes))
+    return hashes[hash_algo].digest()
+
+
+def ranged_checksum(fetcher: RangeFetcher, part_size: int = constants.S3_PART_SIZE,
+                    hash_algo: str = 'md5', nworkers: int = constants.RANGE_WORKERS,
+                    buf_size: int = constants.CHECKSUM_BUF_SIZE) -> dict:
+    """
+    Download parts of an object concurrently and hash each of them.
+    :param fetcher: S3RangeFetcher, HTTPRangeFetcher or another RangeFetcher
+    :param part_size: bytes per part, the upload part size for an S3 ETag
+    :param hash_algo: algorithm of system_utils.HASH_ALGOS
+    :param nworkers: parts downloaded at once
+    :param buf_size: read buffer of one part
+    :return: dict(size, parts=[hex digest per part], composite="<hex>-<parts>")
+    """
+    system_utils.new_hashes(hash_algo)  # fail early on an unsupported algorithm
+    size = fetcher.size()
+    ranges = part_ranges(size, part_size)
+    if not ranges:
+        digests = [hashlib.new(hash_algo).digest()]
+    else:
+        workers = Workers()
+        workers.start_workers(max(1, min(nworkers, len(ranges))))
+        with workers:
+            digests = list(workers.map(
+                lambda rng: _hash_part(fetcher, rng[0], rng[1], hash_algo, buf_size), ranges))
+    composite = hashlib.new(hash_algo, b"".join(digests)).hexdigest()
+    LOGGER.debug("Hashed %s bytes in %s parts of %s", size, len(digests), part_size)
+    return dict(size=size, parts=[digest.hex() for digest in digests],
+                composite="{}-{}".format(composite, len(digests)))
+
+
+def verify_etag(fetcher: RangeFetcher, etag: str, nworkers: int = constants.RANGE_WORKERS,
+                part_size: int = None) -> bool:
+    """
+    Check an S3 ETag against the content, a single part ETag is a plain md5.
+    Every part size consistent with the ETag part count is tried, the likely
+    ones first, until one matches.
+    :param fetcher: source of the object
+    :param etag: ETag of the object, quoted or not
+    :param nworkers: parts downloaded at once
+    :param part_size: part size of the upload when known
+    """
+    etag = etag.strip('"')
+    size = fetcher.size()
+    for candidate in part_sizes_from_etag(etag, size, part_size):
+        result = ranged_checksum(fetcher, max(candidate, 1), 'md5', nworkers)
+        if '-' not in etag:
+            return len(result["parts"]) == 1 and result["parts"][0] == etag
+        if result["composite"] == etag:
+            return True
+    return False
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""Memory compact records of fixed schema entities like authors, pets or users.
+
+A record class has one __slots__ attribute per field instead of a per instance
+dict and is a MutableMapping, so callers index and update it like the dict
+it replaces. dict(record) or record.to_dict() gives a plain dict for JSON bodies.
+"""
+
+import sys
+from collections.abc import MutableMapping
+from typing import Iterable
+from typing import Iterator
+
+#: Record classes by schema, so that the same schema always gives the same class.
+_CLASSES = dict()
+
+
+class Record(MutableMapping):
+    """Base of the classes made by record_class."""
+
+    __slots__ = ()
+    _fields = ()
+    _interned = frozenset()
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Set fields like dict(*args, **kwargs), fields not given stay unset."""
+        self.update(*args, **kwargs)
+
+    def __getitem__(self, key: str):
+        if key not in self._fields:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in self._fields:
+            raise KeyError("{} has no field {}".format(type(self).__name__, key))
+        if key in self._interned and type(value) is str:
+            value = sys.intern(value)
+        setattr(self, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self._fields:
+            raise KeyError(key)
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return (field for field in self._fields if hasattr(self, field))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> dict:
+        """Plain dict of the set fields."""
+        return dict(self.items())
+
+    def __reduce__(self) -> tuple:
+        # pickled by schema, the class does not have to be importable
+        cls = type(self)
+        return _restore, (cls.__name__, cls._fields, tuple(sorted(cls._interned)),
+                          self.to_dict())
+
+    def __repr__(self) -> str:
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(key, value) for key, value in self.items()))
+
+
+def record_class(name: str, fields: Iterable[str], interned: Iterable[str] = ()) -> type:
+    """
+    Create a Record class with a slot per field, or return the one of the same schema.
+    :param name: class name
+    :param fields: field names, also the iteration order
+    :param interned: fields whose string values are interned, for values repeated
+        over many records like a status or category
+    :return: Record subclass
+    """
+    fields, interned = tuple(fields), frozenset(interned)
+    schema = (name, fields, interned)
+    if schema not in _CLASSES:
+        class _Record(Record):
+            __slots__ = fields
+            _fields = fields
+            _interned = interned
+
+        _Record.__name__ = _Record.__qualname__ = name
+        _CLASSES.setdefault(schema, _Record)
+    return _CLASSES[schema]
+
+
+def _restore(name: str, fields: tuple, interned: tuple, state: dict) -> Record:
+    """Unpickle a record of the class of its schema."""
+    return record_class(name, fields, interned)(state)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""Incremental parsing of JSON payloads read in chunks from a stream."""
+
+import codecs
+import json
+from typing import Any
+from typing import Iterable
+from typing import Iterator
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[Any]:
+    """
+    Yield the items of a top level JSON array as soon as each one is complete.
+    Only the unparsed tail of the payload is kept in memory, so a consumer that
+    stops early never reads the rest of the stream.
+    :param chunks: iterable of byte chunks e.g. response.iter_content(chunk_size)
+    :param encoding: payload encoding
+    :return: iterator over array items
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    chunks = iter(chunks)
+    buf = ""
+    pos = 0
+    eof = False
+
+    def _fill(min_size: int = 0):
+        """Read chunks till more than min_size characters are unparsed, or EOF."""
+        nonlocal buf, pos, eof
+        parts = [buf[pos:]]
+        size = len(parts[0])
+        for chunk in chunks:
+            parts.append(decoder.decode(chunk))
+            size += len(parts[-1])
+            if size > min_size:
+                break
+        else:
+            parts.append(decoder.decode(b"", final=True))
+            eof = True
+        buf = "".join(parts)
+        pos = 0
+
+    def _peek() -> str:
+        """Next non whitespace character, empty at EOF."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or eof:
+                return buf[pos:pos + 1]
+            _fill()
+
+    if _peek() != "[":
+        raise ValueError("Expected a JSON array, got {!r}".format(_peek()))
+    pos += 1
+    closed = _peek() == "]"
+    if closed:
+        pos += 1
+    while not closed:
+        if not _peek():
+            raise ValueError("Truncated JSON array")
+        while True:
+            try:
+                item, end = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # at least double the unparsed text so a big item is not re-parsed often
+                _fill(2 * (len(buf) - pos))
+                continue
+            # only a following ',' or ']' proves a number or literal is complete
+            delim = end
+            while delim < len(buf) and buf[delim] in _WHITESPACE:
+                delim += 1
+            if eof or (delim < len(buf) and buf[delim] in ",]"):
+                break
+            _fill(2 * (len(buf) - pos))
+        pos = end
+        yield item
+        sep = _peek()
+        if not sep or sep not in ",]":
+            raise ValueError("Expected ',' or ']' in JSON array, got {!r}".format(sep))
+        pos += 1
+        closed = sep == "]"
+        if not closed and _peek() == "]":
+            raise ValueError("Trailing ',' in JSON array")
+    if _peek():
+        raise ValueError("Extra data after JSON array: {!r}".format(_peek()))
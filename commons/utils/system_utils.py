@@ -7,14 +7,21 @@ import os
 import sys
 import shutil
 import errno
+import hashlib
+import itertools
+import mmap
+import random
 import threading
 import secrets
-from collections import deque
+import time
+from collections import OrderedDict
 from subprocess import Popen, PIPE
-from hashlib import md5
-from pathlib import Path
-from botocore.response import StreamingBody
+from typing import Iterable
+from typing import Iterator
+from typing import Union
 from commons import constants
+from commons.worker import Workers
+from commons.worker import cpu_bound
 
 if sys.platform == 'win32':
     try:
@@ -83,42 +90,113 @@ def run_local_cmd(cmd: str = None, env: dict = None,
         LOGGER.exception(ex)
         return False, ex
     finally:
-        if proc:
+        if proc and proc.poll() is None:
             proc.terminate()
 
 
-def calc_checksum(object_ref: object, hash_algo: str = 'md5'):
+#: Digests calc_checksum computes, names of hashlib.new.
+HASH_ALGOS = frozenset({'md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512',
+                        'blake2b', 'blake2s', 'sha3_256', 'sha3_512'})
+
+
+def new_hashes(hash_algos: Union[str, Iterable[str]]) -> dict:
     """
-    Calculate checksum of file or stream
-    :param object_ref: Object/File Path or byte/buffer stream
-    :param hash_algo: md5 or sha1
-    :return:
-    """
-    read_sz = 8192
-    csum = None
-    file_hash = md5()  # nosec
-    if hash_algo != 'md5':
-        raise NotImplementedError('Only md5 supported')
-    if isinstance(object_ref, StreamingBody):
-        chunk = object_ref.read(amt=read_sz)
+    Create hash objects.
+    :param hash_algos: name or names out of HASH_ALGOS
+    :return: dict of name to hash object
+    """
+    names = [hash_algos] if isinstance(hash_algos, str) else list(hash_algos)
+    unsupported = set(names) - HASH_ALGOS
+    if unsupported or not names:
+        raise NotImplementedError('Unsupported hash algorithm {}, use {}'.format(
+            sorted(unsupported), sorted(HASH_ALGOS)))
+    return {name: hashlib.new(name, usedforsecurity=False) for name in names}
+
+
+def hash_stream(stream: object, hashes: dict, buf_size: int = constants.CHECKSUM_BUF_SIZE) -> int:
+    """
+    Feed a stream to hash objects, reading into one reusable buffer when the
+    stream supports readinto.
+    :param stream: binary file object, StreamingBody or any object with read(amt)
+    :param hashes: hash objects of new_hashes
+    :param buf_size: bytes read at once
+    :return: number of bytes hashed
+    """
+    updates = [hsh.update for hsh in hashes.values()]
+    total = 0
+    readinto = getattr(stream, 'readinto', None)
+    if readinto is None:
+        chunk = stream.read(buf_size)
         while chunk:
-            file_hash.update(chunk)
-            chunk = object_ref.read(amt=read_sz)
-        return file_hash.hexdigest()
-    if os.path.exists(object_ref):
-        size = Path(object_ref).stat().st_size
-
-        with open(object_ref, 'rb') as file_ptr:
-            if size < read_sz:
-                buf = file_ptr.read(size)
-            else:
-                buf = file_ptr.read(read_sz)
-            while buf:
-                file_hash.update(buf)
-                buf = file_ptr.read(read_sz)
-            csum = file_hash.hexdigest()
+            for update in updates:
+                update(chunk)
+            total += len(chunk)
+            chunk = stream.read(buf_size)
+        return total
+    buf = bytearray(buf_size)
+    with memoryview(buf) as view:
+        while True:
+            nbytes = readinto(buf)
+            if not nbytes:
+                break
+            chunk = view[:nbytes] if nbytes < buf_size else view
+            for update in updates:
+                update(chunk)
+            total += nbytes
+    return total
 
-    return csum
+
+def hash_file(path: str, hashes: dict, buf_size: int = constants.CHECKSUM_BUF_SIZE,
+              use_mmap: bool = True) -> int:
+    """
+    Feed a local file to hash objects, from a memory map of the file or with
+    readinto.
+    :param path: file path
+    :param hashes: hash objects of new_hashes
+    :param buf_size: bytes hashed at once
+    :param use_mmap: map the file instead of reading it
+    :return: number of bytes hashed
+    """
+    with open(path, 'rb', buffering=0) as file_ptr:
+        size = os.fstat(file_ptr.fileno()).st_size
+        if not use_mmap or not size:
+            return hash_stream(file_ptr, hashes, buf_size)
+        updates = [hsh.update for hsh in hashes.values()]
+        with mmap.mmap(file_ptr.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mapped) as view:
+                for offset in range(0, size, buf_size):
+                    chunk = view[offset:offset + buf_size]
+                    for update in updates:
+                        update(chunk)
+                    chunk.release()
+        return size
+
+
+@cpu_bound
+def calc_checksum(object_ref: object, hash_algo: Union[str, Iterable[str]] = 'md5',
+                  buf_size: int = constants.CHECKSUM_BUF_SIZE, use_mmap: bool = True):
+    """
+    Calculate checksum of file or stream
+    :param object_ref: Object/File Path or byte/buffer stream
+    :param hash_algo: md5, sha1, sha256, blake2b... (HASH_ALGOS), or a list of
+        them to compute several digests in one pass
+    :param buf_size: bytes read and hashed at once
+    :param use_mmap: hash local files from a memory map
+    :return: hex digest, or dict of algorithm to hex digest for a list of algorithms,
+        None when the file does not exist
+    """
+    hashes = new_hashes(hash_algo)
+    if isinstance(object_ref, (str, os.PathLike)):
+        if not os.path.exists(object_ref):
+            return None
+        hash_file(object_ref, hashes, buf_size, use_mmap)
+    else:
+        hash_stream(object_ref, hashes, buf_size)
+    if isinstance(hash_algo, str):
+        return hashes[hash_algo].hexdigest()
+    return {name: hsh.hexdigest() for name, hsh in hashes.items()}
 
 
 def cleanup_dir(dpath: str) -> bool:
@@ -185,35 +263,171 @@ def remove_dirs(dpath: str) -> bool:
     return True
 
 
+#: Content kinds of generate_file.
+FILE_CONTENTS = ('zero', 'sparse', 'alloc', 'random', 'pattern')
+#: dd size suffixes: a bare letter or xiB is binary, xB is decimal.
+_SIZE_UNITS = dict(K=1024, M=1024 ** 2, G=1024 ** 3, T=1024 ** 4,
+                   KIB=1024, MIB=1024 ** 2, GIB=1024 ** 3, TIB=1024 ** 4,
+                   KB=1000, MB=1000 ** 2, GB=1000 ** 3, TB=1000 ** 4)
+
+
+def parse_size(size: Union[int, str]) -> int:
+    """Bytes of a dd style size like 512, '4K', '1M', '1MB' (10^6) or '2GiB'."""
+    if isinstance(size, int):
+        return size
+    size = size.strip().upper()
+    number = size.rstrip('KMGTIB')
+    unit = size[len(number):]
+    if unit and unit != 'B':
+        if unit not in _SIZE_UNITS:
+            raise ValueError("Unknown size unit {!r}".format(unit))
+        return int(number) * _SIZE_UNITS[unit]
+    return int(number)
+
+
+def _fill_buffer(content: str, buf_size: int, pattern: bytes) -> mmap.mmap:
+    """Reusable page aligned buffer of zeros or of the repeated pattern, close it after use."""
+    if content == 'pattern':
+        # whole repetitions only, so that consecutive writes keep the phase
+        buf_size = max(len(pattern), buf_size - buf_size % len(pattern))
+    buf = mmap.mmap(-1, buf_size)
+    if content == 'pattern':
+        buf[:] = pattern * (buf_size // len(pattern))
+    return buf
+
+
+def _chunks(content: str, size: int, buf_size: int, pattern: bytes,
+            seed: int = None) -> Iterator[memoryview]:
+    """Yield size bytes of content in chunks, views of one reused buffer except seeded random."""
+    if content == 'random' and (seed is not None or not os.path.exists('/dev/urandom')):
+        # random.Random has no fill-into API, seeded chunks are fresh bytes
+        rng = random.Random(seed)
+        for offset in range(0, size, buf_size):
+            yield rng.randbytes(min(buf_size, size - offset))
+        return
+    src = open('/dev/urandom', 'rb', buffering=0) if content == 'random' else None
+    try:
+        with _fill_buffer(content, buf_size, pattern) as buf, memoryview(buf) as view:
+            for offset in range(0, size, len(view)):
+                with view[:min(len(view), size - offset)] as chunk:
+                    if src is not None:
+                        src.readinto(chunk)
+                    yield chunk
+    finally:
+        if src is not None:
+            src.close()
+
+
+def _fallocate(fd: int, size: int) -> bool:
+    """Reserve size bytes of fd, False when the platform or file system (tmpfs, NFS) can not."""
+    if not hasattr(os, 'posix_fallocate'):
+        return False
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError as error:
+        if error.errno not in (errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL):
+            raise
+        LOGGER.debug("posix_fallocate not supported: %s", error)
+        return False
+    return True
+
+
+def generate_file(fpath: str, size: Union[int, str], content: str = 'zero', seed: int = None,
+                  pattern: bytes = b'\xde\xad\xbe\xef', hash_algo: str = None,
+                  buf_size: int = constants.CHECKSUM_BUF_SIZE) -> Union[str, None]:
+    """
+    Write a file of size bytes in process.
+    :param fpath: File path
+    :param size: bytes, or a size string like '10M'
+    :param content: zero writes zeros, sparse only sets the size (holes read as zeros),
+        alloc reserves zeroed blocks with fallocate (writes zeros where unsupported),
+        random writes pseudo random bytes of seed (/dev/urandom without seed),
+        pattern repeats pattern
+    :param seed: seed of random content, the same seed and buf_size give the same file
+    :param pattern: bytes repeated by pattern content
+    :param hash_algo: algorithm of HASH_ALGOS to digest the content while writing it
+    :param buf_size: bytes written at once
+    :return: hex digest of the content when hash_algo is given, else None
+    """
+    if content not in FILE_CONTENTS:
+        raise ValueError("content should be one of {}".format(FILE_CONTENTS))
+    size = parse_size(size)
+    hashes = new_hashes(hash_algo) if hash_algo else dict()
+    updates = [hsh.update for hsh in hashes.values()]
+    with open(fpath, 'wb', buffering=0) as file_ptr:
+        out = file_ptr
+        if content == 'sparse' or (content == 'alloc' and
+                                   (not size or _fallocate(file_ptr.fileno(), size))):
+            file_ptr.truncate(size)
+            # the file reads as zeros, only hash them when asked to
+            out = None
+        if content in ('sparse', 'alloc'):
+            content = 'zero'
+        if out is not None or updates:
+            for chunk in _chunks(content, size, buf_size, pattern, seed):
+                for update in updates:
+                    update(chunk)
+                if out is not None:
+                    out.write(chunk)
+    if hash_algo:
+        return hashes[hash_algo].hexdigest()
+    return None
+
+
+def create_files(fpaths: Iterable[str], size: Union[int, str], content: str = 'random',
+                 seed: int = None, hash_algo: str = None,
+                 nworkers: int = constants.NWORKERS, **kwargs) -> dict:
+    """
+    Write many files of the same size in parallel with generate_file.
+    :param fpaths: File paths
+    :param seed: random content seed of the first file, the next ones get seed + 1...
+        so that every file differs but is reproducible
+    :param kwargs: more arguments of generate_file
+    :return: dict of file path to hex digest (None without hash_algo)
+    """
+    fpaths = list(fpaths)
+    if not fpaths:
+        return dict()
+    workers = Workers()
+    workers.start_workers(min(nworkers, len(fpaths)))
+    with workers:
+        digests = workers.map(
+            lambda idx: generate_file(fpaths[idx], size, content,
+                                      None if seed is None else seed + idx,
+                                      hash_algo=hash_algo, **kwargs), range(len(fpaths)))
+        return dict(zip(fpaths, digests))
+
+
 def create_file(fpath: str, count: int, dev: str = "/dev/zero", b_size: str = "1M") -> tuple:
     """
-    Create file using dd command
+    Create file of count blocks like dd, in process without spawning dd.
     :param fpath: File path
     :param count: size of the file in MB
-    :param dev: Input file used
+    :param dev: Input file used, /dev/zero, /dev/urandom or any readable file
     :param b_size: block size
-    :return:
+    :return: True when the file exists, summary of the bytes written
     """
-    proc = None
+    size = count * parse_size(b_size)
+    LOGGER.debug("create %s of %s bytes from %s", fpath, size, dev)
     try:
-        cmd = constants.CREATE_FILE.format(dev, fpath, b_size, count)
-        LOGGER.debug(cmd)
-        proc = Popen(cmd, shell=True, stderr=PIPE, stdout=PIPE, encoding="utf-8")  # nosec (B603)
-        output, error = proc.communicate()
-        LOGGER.debug("output = %s", str(output))
-        LOGGER.debug("error = %s", str(error))
-        if proc.returncode != 0:
-            if os.path.isfile(fpath):
-                os.remove(fpath)
-            raise IOError(f"Unable to create file. command: {cmd}, error: {error}")
-
-        return os.path.exists(fpath), ", ".join([output, error])
-    except RuntimeError as ex:
-        LOGGER.exception(ex)
-        return fpath, ex
-    finally:
-        if proc:
-            proc.terminate()
+        if dev == "/dev/zero":
+            generate_file(fpath, size, 'zero')
+        elif dev in ("/dev/urandom", "/dev/random"):
+            generate_file(fpath, size, 'random')
+        else:
+            block = parse_size(b_size)
+            with open(dev, 'rb') as src, open(fpath, 'wb') as dst:
+                # like dd, stop early at the end of the input
+                for _ in range(count):
+                    chunk = src.read(block)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+    except OSError as error:
+        if os.path.isfile(fpath):
+            os.remove(fpath)
+        raise IOError(f"Unable to create file {fpath} from {dev}, error: {error}") from error
+    return os.path.exists(fpath), f"{size} bytes written to {fpath}"
 
 
 def remove_file(file_path: str = None):
@@ -259,6 +473,7 @@ class FileLock:
                     LOGGER.debug("Lock file created.")
             return self.fmutex, True
         else:
+            fname = lock_file
             if not lock_file.startswith('/'):
                 # If Not an absolute path name, prefix in $HOME/.runner
                 fname = os.path.join(os.getenv('HOME'), '.runner', lock_file)
@@ -311,82 +526,218 @@ class FileLock:
 
 class LRUCache:
     """
-    In memory cache for storing test id and test node information
+    In memory cache for storing test id and test node information.
+    Evicts the least recently stored or looked up entry, entries may expire
+    after a time to live.
     """
 
-    def __init__(self, size: int) -> None:
+    def __init__(self, size: int, ttl: float = None) -> None:
+        """
+        :param size: maximum number of entries
+        :param ttl: default seconds an entry lives, None for no expiry
+        """
         self.maxsize = size
-        self.fifo = deque()
-        self.table = dict()
+        self.ttl = ttl
+        self.table = OrderedDict()
+        self.expiry = dict()
+        self.hits = self.misses = self.evictions = 0
         self._lock = threading.Lock()
 
-    def store(self, key: str, value: str) -> None:
+    def store(self, key: str, value: str, ttl: float = None) -> None:
         """
-        Stores the key and value and evicts left most old entry.
+        Stores the key and value and evicts the least recently used entry.
         :param key:
         :param value:
+        :param ttl: seconds the entry lives, defaults to the ttl of the cache
         """
-        self._lock.acquire()
-        if key not in self.table:
-            self.fifo.append(key)
-        self.table[key] = value
-
-        if len(self.fifo) > self.maxsize:
-            del_key = self.fifo.popleft()
-            try:
-                del self.table[del_key]
-            except KeyError as ke:
-                pass
-        self._lock.release()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if key not in self.table:
+                self._on_add(key)
+            self.table[key] = value
+            self.table.move_to_end(key)
+            if ttl is not None:
+                self.expiry[key] = time.monotonic() + ttl
+            elif self.expiry:
+                self.expiry.pop(key, None)
+            if len(self.table) > self.maxsize:
+                del_key, _ = self.table.popitem(last=False)
+                self.expiry.pop(del_key, None)
+                self._on_remove(del_key)
+                self.evictions += 1
 
     def lookup(self, key: str) -> str:
         """
         Lookup cache for key.
         :param key:
         :return: val of entry
+        :raises KeyError: when the key is not cached or expired
         """
-        self._lock.acquire()
-        try:
-            val = self.table[key]
-        finally:
-            self._lock.release()
+        with self._lock:
+            try:
+                val = self.table[key]
+            except KeyError:
+                self.misses += 1
+                raise
+            if self.expiry and self.expiry.get(key, float("inf")) <= time.monotonic():
+                del self.table[key]
+                del self.expiry[key]
+                self._on_remove(key)
+                self.misses += 1
+                raise KeyError(key)
+            self.table.move_to_end(key)
+            self.hits += 1
         return val
 
-    def delete(self, key: str) -> None:
+    def peek(self, key: str) -> str:
         """
-        Removes the table entry. The fifo list entry is removed whenever we
-        cache is full.
+        Lookup cache for key without taking the lock or refreshing the recency
+        of the entry, single dict reads are atomic in CPython.
+        :raises KeyError: when the key is not cached or expired
         """
-        self._lock.acquire()
-        try:
-            del self.table[key]
-        except KeyError as ke:
-            pass
-        try:
-            self.fifo.remove(key)
-        except ValueError as ve:
-            pass
-        finally:
-            self._lock.release()
+        val = self.table[key]
+        expires = self.expiry.get(key)
+        if expires is not None and expires <= time.monotonic():
+            raise KeyError(key)
+        return val
+
+    def delete(self, key: str) -> None:
+        """Removes the table entry."""
+        with self._lock:
+            if key in self.table:
+                del self.table[key]
+                self.expiry.pop(key, None)
+                self._on_remove(key)
+
+    def _on_add(self, key: str) -> None:
+        """Hook called with the lock held before a new key enters the table."""
+
+    def _on_remove(self, key: str) -> None:
+        """Hook called with the lock held after a key left the table."""
 
     def get_keys(self):
         return self.table.keys()        # expensive
 
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters with the number of entries."""
+        with self._lock:
+            return dict(size=len(self.table), hits=self.hits, misses=self.misses,
+                        evictions=self.evictions)
+
 class InMemoryDB(LRUCache):
-    """In memory storage"""
+    """
+    In memory storage. Keys are also kept in a dense list with their positions
+    in an index map, so that a random entry is picked in O(1).
+    """
+
+    def __init__(self, size: int, ttl: float = None) -> None:
+        super().__init__(size, ttl)
+        self._keys = list()
+        self._index = dict()
+
+    def _on_add(self, key: str) -> None:
+        self._index[key] = len(self._keys)
+        self._keys.append(key)
+
+    def _on_remove(self, key: str) -> None:
+        # move the last key into the hole to keep the list dense
+        pos = self._index.pop(key)
+        last = self._keys.pop()
+        if pos < len(self._keys):
+            self._keys[pos] = last
+            self._index[last] = pos
 
     def pop_one(self) -> tuple:
         """
         Pop one table entry randomly.
+        :return: key, value or False, False when empty
         """
-        self._lock.acquire()
-        keys = list(self.table.keys())
-        if len(keys) == 0:
-            self._lock.release()
-            return False, False
-        key = secrets.choice(keys)
-        try:
+        with self._lock:
+            if not self._keys:
+                return False, False
+            key = self._keys[secrets.randbelow(len(self._keys))]
             val = self.table.pop(key)
-        finally:
-            self._lock.release()
+            self.expiry.pop(key, None)
+            self._on_remove(key)
         return key, val
+
+    def peek_one(self) -> tuple:
+        """
+        Get one table entry randomly without removing it.
+        :return: key, value or False, False when empty
+        """
+        with self._lock:
+            if not self._keys:
+                return False, False
+            key = self._keys[secrets.randbelow(len(self._keys))]
+            return key, self.table[key]
+
+
+class ShardedCache:
+    """
+    Cache split into independently locked segments by key hash, so that threads
+    working on different keys do not contend for one lock. Each segment holds
+    size / shards entries and evicts on its own.
+    """
+
+    def __init__(self, size: int, shards: int = 16, segment_cls: type = LRUCache,
+                 **kwargs) -> None:
+        """
+        :param size: maximum number of entries over all segments
+        :param shards: number of segments
+        :param segment_cls: LRUCache or a subclass like InMemoryDB
+        :param kwargs: more arguments of segment_cls e.g. ttl
+        """
+        self.maxsize = size
+        self.segments = [segment_cls(-(-size // shards), **kwargs) for _ in range(shards)]
+
+    def segment(self, key: str) -> LRUCache:
+        """Segment holding key."""
+        return self.segments[hash(key) % len(self.segments)]
+
+    def store(self, key: str, value: str, ttl: float = None) -> None:
+        self.segment(key).store(key, value, ttl)
+
+    def lookup(self, key: str) -> str:
+        return self.segment(key).lookup(key)
+
+    def peek(self, key: str) -> str:
+        return self.segment(key).peek(key)
+
+    def delete(self, key: str) -> None:
+        self.segment(key).delete(key)
+
+    def get_keys(self):
+        return itertools.chain.from_iterable(
+            segment.get_keys() for segment in self.segments)   # expensive
+
+    def pop_one(self) -> tuple:
+        """
+        Pop one table entry randomly from the first non empty segment after a
+        random one, segments need a pop_one (InMemoryDB).
+        """
+        return self._random_entry("pop_one")
+
+    def peek_one(self) -> tuple:
+        """Get one table entry randomly like pop_one without removing it."""
+        return self._random_entry("peek_one")
+
+    def _random_entry(self, method: str) -> tuple:
+        start = secrets.randbelow(len(self.segments))
+        for idx in range(len(self.segments)):
+            segment = self.segments[(start + idx) % len(self.segments)]
+            key, val = getattr(segment, method)()
+            if key is not False:
+                return key, val
+        return False, False
+
+    def stats(self) -> dict:
+        """Counters of LRUCache.stats summed over the segments."""
+        total = dict(size=0, hits=0, misses=0, evictions=0)
+        for segment in self.segments:
+            for name, value in segment.stats().items():
+                total[name] += value
+        return total
+
+    def __len__(self) -> int:
+        return sum(len(segment.table) for segment in self.segments)
@@ -1,70 +1,583 @@
 # -*- coding: utf-8 -*-
 
 """Worker pool to perform similar tasks"""
+import heapq
+import itertools
 import logging
-import queue
+import os
+import pickle
 import threading
+import time
+from collections import deque
+from concurrent import futures
+from dataclasses import dataclass
+from dataclasses import field
 from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
 from threading import Thread
 from commons.constants import NWORKERS
+from commons.constants import PROCESS_CHUNKSIZE
+from commons.constants import WORKER_IDLE_TIMEOUT
+from commons.constants import WORKER_TARGET_WAIT
+from commons.constants import WORKER_BATCH
+from commons.exceptions import DeadlineExceeded
 
 logger = logging.getLogger(__name__)
 
+#: Workers backends: threads for I/O bound tasks, processes for CPU bound tasks and
+#: hybrid, running functions marked with cpu_bound on processes and others on threads.
+THREAD = "thread"
+PROCESS = "process"
+HYBRID = "hybrid"
+BACKENDS = (THREAD, PROCESS, HYBRID)
 
-class WorkQ(queue.Queue):
-    def __init__(self, func: Any, maxsize: int) -> None:
-        self.lock_req = maxsize != 0
+#: Task priorities of the worker threads, lower ones are served first:
+#: cleanup/teardown calls, health checks, regular tasks and bulk seeding.
+PRIORITY_CRITICAL = 0
+PRIORITY_HEALTH = 10
+PRIORITY_NORMAL = 20
+PRIORITY_BULK = 30
+
+
+class WorkQ:
+    """
+    Bounded priority task queue guarded by one lock, FIFO within a priority.
+    put blocks while the queue is full (backpressure) and get_batch hands out
+    several tasks per lock round trip. Urgent items are queued past the bound
+    so that they never wait behind blocked bulk producers.
+    """
+
+    def __init__(self, func: Any = None, maxsize: int = 0,
+                 urgent: int = PRIORITY_HEALTH) -> None:
+        """
+        :param func: default callable of the queued items
+        :param maxsize: maximum queued items, 0 for unbounded
+        :param urgent: items of this priority or a lower (more urgent) one ignore maxsize
+        """
         self.func = func
-        self.semaphore = threading.Semaphore(maxsize)
-        queue.Queue.__init__(self, maxsize)
+        self.maxsize = maxsize
+        self.urgent = urgent
+        self.consumers = 1
+        self._items = []
+        self._seq = itertools.count()
+        self._unfinished = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def _full(self, priority: int) -> bool:
+        return bool(self.maxsize) and len(self._items) >= self.maxsize and \
+            priority > self.urgent
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+
+    def put(self, item: Any, priority: int = PRIORITY_NORMAL) -> None:
+        """
+        Queue one item, blocking while the queue is full unless it is urgent.
+        :raises RuntimeError: once the queue is closed
+        """
+        with self._not_full:
+            self._check_open()
+            while self._full(priority):
+                self._not_full.wait()
+                self._check_open()
+            heapq.heappush(self._items, (priority, next(self._seq), item))
+            self._unfinished += 1
+            self._not_empty.notify()
+
+    def put_many(self, items: Iterable, priority: int = PRIORITY_NORMAL) -> None:
+        """
+        Queue items of one priority taking the lock once per free slot window.
+        :raises RuntimeError: once the queue is closed
+        """
+        items = list(items)
+        while items:
+            with self._not_full:
+                self._check_open()
+                while self._full(priority):
+                    self._not_full.wait()
+                    self._check_open()
+                if self.maxsize and priority > self.urgent:
+                    room = self.maxsize - len(self._items)
+                else:
+                    room = len(items)
+                chunk, items = items[:room], items[room:]
+                for item in chunk:
+                    heapq.heappush(self._items, (priority, next(self._seq), item))
+                self._unfinished += len(chunk)
+                self._not_empty.notify(len(chunk))
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def get_batch(self, max_items: int = 1, timeout: float = None) -> list:
+        """
+        Take up to max_items, blocking while the queue is empty. A consumer takes
+        no more than its share of the backlog so that idle consumers get work too.
+        :param timeout: seconds to wait for an item, None waits forever
+        :return: list of items, empty once the queue is closed and drained or on timeout
+        """
+        with self._not_empty:
+            while not self._items:
+                if self._closed:
+                    return []
+                if not self._not_empty.wait(timeout) and not self._items:
+                    return []
+            take = max(1, min(max_items, len(self._items) // self.consumers))
+            batch = [heapq.heappop(self._items)[2] for _ in range(take)]
+            self._not_full.notify(take)
+            return batch
+
+    def get(self) -> Any:
+        """Take one item, None once the queue is closed and drained."""
+        batch = self.get_batch(1)
+        return batch[0] if batch else None
+
+    def task_done(self, count: int = 1) -> None:
+        """Mark count items taken by get/get_batch as processed."""
+        with self._lock:
+            self._unfinished -= count
+            if self._unfinished <= 0:
+                self._all_done.notify_all()
+
+    def join(self) -> None:
+        """Block till every queued item is processed."""
+        with self._all_done:
+            while self._unfinished:
+                self._all_done.wait()
+
+    def close(self) -> None:
+        """Wake up consumers, get_batch returns an empty list once drained; puts fail."""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+
+def _run_task(task: tuple) -> None:
+    """Run a submitted callable and settle its future with the result or exception."""
+    future, func, args, kwargs = task
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        result = func(*args, **kwargs)
+    except BaseException as exc:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+def _results(fs: list, timeout: float = None) -> Iterator:
+    """Yield results of futures in order, pending ones are cancelled on early exit."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        for future in fs:
+            yield future.result(None if deadline is None else deadline - time.monotonic())
+    finally:
+        for future in fs:
+            future.cancel()
+
+
+@dataclass
+class PoolStats:
+    """Thread safe task counters and timings in seconds of a worker pool."""
+
+    tasks: int = 0
+    wait_time: float = 0.0
+    max_wait: float = 0.0
+    exec_time: float = 0.0
+    last_wait: float = 0.0
+    grown: int = 0
+    shrunk: int = 0
+    dropped: int = 0
+    drops: deque = field(default_factory=lambda: deque(maxlen=100), repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, tasks: int, wait_time: float, max_wait: float, exec_time: float) -> None:
+        """
+        Account a batch of tasks run by a worker.
+        :param wait_time: seconds the tasks spent queued, summed
+        :param max_wait: longest queued time of a task of the batch
+        :param exec_time: seconds spent running the tasks
+        """
+        with self._lock:
+            self.tasks += tasks
+            self.wait_time += wait_time
+            self.max_wait = max(self.max_wait, max_wait)
+            self.exec_time += exec_time
+            self.last_wait = max_wait
+
+    def record_scale(self, grown: int = 0, shrunk: int = 0) -> None:
+        """Account threads added or retired, a growth resets last_wait."""
+        with self._lock:
+            self.grown += grown
+            self.shrunk += shrunk
+            if grown:
+                self.last_wait = 0.0
+
+    def record_drop(self, item: Any, reason: str) -> None:
+        """Account a task dropped without running, the last 100 (item, reason) are kept."""
+        with self._lock:
+            self.dropped += 1
+            self.drops.append((item, reason))
 
-    def put(self, item):
-        if self.lock_req:
-            self.semaphore.acquire()
-        queue.Queue.put(self, item)
+    def as_dict(self) -> dict:
+        """Snapshot of the counters with average wait and exec time per task."""
+        with self._lock:
+            tasks = self.tasks or 1
+            return dict(tasks=self.tasks, wait_avg=self.wait_time / tasks,
+                        wait_max=self.max_wait, exec_avg=self.exec_time / tasks,
+                        grown=self.grown, shrunk=self.shrunk, dropped=self.dropped,
+                        drops=list(self.drops))
 
-    def task_done(self):
-        if self.lock_req:
-            self.semaphore.release()
-        queue.Queue.task_done(self)
+
+def cpu_bound(func: Callable) -> Callable:
+    """Mark func to run on the worker processes of a hybrid Workers."""
+    func.cpu_bound = True
+    return func
+
+
+def _check_picklable(func: Callable) -> None:
+    """Raise TypeError in the caller when func cannot be sent to a worker process."""
+    try:
+        pickle.dumps(func)
+    except Exception as exc:
+        raise TypeError("task {!r} cannot be run in a worker process: {}".format(
+            func, exc)) from exc
+
+
+def _run_chunk(func: Callable, items: list) -> int:
+    """Apply func to a chunk of wenque items inside a worker process."""
+    for item in items:
+        try:
+            func(item)
+        except Exception as exc:
+            logger.exception('task %s failed: %s', item, exc)
+    return len(items)
 
 
 class Workers(object):
-    """ A fixed size thread pool for I/O bound tasks """
+    """
+    A fixed size pool running tasks on threads (I/O bound tasks), processes
+    (CPU bound tasks) or both (hybrid backend, see cpu_bound).
+    """
 
-    def __init__(self):
+    def __init__(self, backend: str = THREAD, mp_context: Any = None):
+        """
+        :param backend: THREAD, PROCESS or HYBRID
+        :param mp_context: multiprocessing context of the worker processes
+        """
+        if backend not in BACKENDS:
+            raise ValueError("backend should be one of {}".format(BACKENDS))
+        self.backend = backend
+        self.mp_context = mp_context
         self.w_workers = []
         self.w_workq = None
+        self.w_func = None
+        self.w_batch = WORKER_BATCH
+        self.w_executor = None
+        self.w_chunksize = PROCESS_CHUNKSIZE
+        self.w_chunks = dict()
+        self._chunk_lock = threading.Lock()
+        self._inflight = None
+        self.w_min_workers = self.w_max_workers = 0
+        self.w_idle_timeout = WORKER_IDLE_TIMEOUT
+        self.w_target_wait = WORKER_TARGET_WAIT
+        self.w_stats = PoolStats()
+        self._scale_lock = threading.Lock()
+        self._picklable = set()
 
     def start_workers(self,
                       nworkers: int = NWORKERS,
-                      func: Any = None) -> None:
-        self.w_workq = WorkQ(func, nworkers)
+                      func: Any = None,
+                      batch_size: int = WORKER_BATCH,
+                      maxsize: int = None,
+                      nprocs: int = None,
+                      chunksize: int = PROCESS_CHUNKSIZE,
+                      max_workers: int = None,
+                      idle_timeout: float = WORKER_IDLE_TIMEOUT,
+                      target_wait: float = WORKER_TARGET_WAIT) -> None:
+        """
+        Start nworkers threads serving one task queue and/or the worker processes.
+        :param nworkers: number of threads, the minimum when max_workers is given;
+            the process backend starts no more processes than CPUs unless nprocs is given
+        :param func: callable applied to the items of wenque
+        :param batch_size: maximum tasks a worker takes from the queue at once
+        :param maxsize: queued tasks after which wenque/submit block,
+            defaults to nworkers * batch_size; PRIORITY_HEALTH and more urgent
+            tasks never block
+        :param nprocs: number of worker processes, defaults to os.cpu_count()
+        :param chunksize: items of wenque/map sent to a worker process at once
+        :param max_workers: autoscale the threads up to max_workers; a thread is
+            added while queued tasks outnumber the threads or a task waited longer
+            than target_wait, threads beyond nworkers exit after idle_timeout
+        :param idle_timeout: seconds an extra thread waits for a task before exiting
+        :param target_wait: seconds a task may stay queued before the pool grows
+        """
+        self.w_func = func
+        if self.backend != THREAD:
+            if nprocs is None:
+                nprocs = os.cpu_count() or 1
+                if self.backend == PROCESS:
+                    nprocs = min(nworkers, nprocs)
+            if func is not None and self._uses_processes(func):
+                self._check_func(func)
+            self.w_chunksize = chunksize
+            self._inflight = threading.BoundedSemaphore(2 * nprocs)
+            self.w_executor = futures.ProcessPoolExecutor(nprocs, self.mp_context)
+        if self.backend == PROCESS:
+            return
+        self.w_min_workers = nworkers
+        self.w_max_workers = max(nworkers, max_workers or 0)
+        self.w_idle_timeout = idle_timeout
+        self.w_target_wait = target_wait
+        if maxsize is None:
+            maxsize = self.w_max_workers * batch_size
+        self.w_batch = batch_size
+        self.w_workq = WorkQ(func, maxsize)
         for i in range(nworkers):
+            self._add_worker()
+
+    def _add_worker(self) -> bool:
+        """Start a worker thread unless the pool is at its maximum size."""
+        with self._scale_lock:
+            if len(self.w_workers) >= self.w_max_workers or self.w_workq.closed:
+                return False
             w = Thread(target=self.worker)
             w.start()
             self.w_workers.append(w)
+            self.w_workq.consumers = len(self.w_workers)
+            return True
+
+    def _retire_worker(self) -> bool:
+        """Let the calling idle thread exit unless the pool is at its minimum size."""
+        with self._scale_lock:
+            if len(self.w_workers) <= self.w_min_workers:
+                return False
+            self.w_workers.remove(threading.current_thread())
+            self.w_workq.consumers = len(self.w_workers)
+        self.w_stats.record_scale(shrunk=1)
+        return True
+
+    def _autoscale(self) -> None:
+        """Grow the pool by a thread when tasks back up or wait too long."""
+        size = len(self.w_workers)
+        if size >= self.w_max_workers:
+            return
+        if self.w_workq.qsize() > size:
+            grow = True
+        else:
+            grow = self.w_stats.last_wait > self.w_target_wait
+        if grow and self._add_worker():
+            self.w_stats.record_scale(grown=1)
+
+    def metrics(self) -> dict:
+        """Pool size, queue depth and task counters with wait/exec times in seconds."""
+        metrics = self.w_stats.as_dict()
+        metrics.update(pool_size=len(self.w_workers),
+                       queue_depth=self.w_workq.qsize() if self.w_workq else 0)
+        return metrics
+
+    def _check_func(self, func: Callable) -> None:
+        """
+        Check func can be sent to the worker processes, once per function. Arguments
+        are not pickled twice: an unpicklable one fails the future of its task.
+        """
+        try:
+            if func in self._picklable:
+                return
+        except TypeError:
+            # unhashable callable, checked every time
+            _check_picklable(func)
+            return
+        _check_picklable(func)
+        self._picklable.add(func)
+
+    def _executor(self) -> futures.ProcessPoolExecutor:
+        """Executor of the worker processes, RuntimeError after end_workers."""
+        if self.w_executor is None:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        return self.w_executor
+
+    def _uses_processes(self, func: Callable) -> bool:
+        """Check func runs on the worker processes."""
+        return self.backend == PROCESS or \
+            (self.backend == HYBRID and getattr(func, "cpu_bound", False))
 
     def worker(self):
+        workq = self.w_workq
+        autoscale = self.w_max_workers > self.w_min_workers
+        timeout = self.w_idle_timeout if autoscale else None
+        monotonic = time.monotonic
         while True:
-            wq = self.w_workq.get()
-            if wq is None:
-                self.w_workq.task_done()
-                break
-            wi = wq.get()
-            wq.func(wi)
-            wq.task_done()
-            self.w_workq.task_done()
-
-    def wenque(self, item):
-        self.w_workq.put(item)
+            batch = workq.get_batch(self.w_batch, timeout)
+            if not batch:
+                if workq.closed or self._retire_worker():
+                    break
+                continue
+            wait_time = max_wait = exec_time = 0.0
+            for func, wi, queued, deadline in batch:
+                start = monotonic()
+                wait_time += start - queued
+                max_wait = max(max_wait, start - queued)
+                if deadline is not None and start > deadline:
+                    self._drop(func, wi, deadline, "deadline exceeded by {:.3f}s after {:.3f}s queued"
+                               .format(start - deadline, start - queued))
+                    continue
+                try:
+                    func(wi)
+                except Exception as exc:
+                    logger.exception('task %s failed: %s', wi, exc)
+                exec_time += monotonic() - start
+            self.w_stats.record(len(batch), wait_time, max_wait, exec_time)
+            workq.task_done(len(batch))
+            if autoscale:
+                self._autoscale()
 
-    def end_workers(self):
-        for i in range(len(self.w_workers)):
-            self.w_workq.put(None)
-        self.w_workq.join()
-        logger.info('shutdown all workers')
-        logger.info('Joining all threads to main thread')
-        for i in range(len(self.w_workers)):
-            self.w_workers[i].join()
+    def _drop(self, func: Callable, wi: Any, deadline: float, reason: str) -> None:
+        """Drop an expired task, a submitted one fails with DeadlineExceeded."""
+        if func is _run_task:
+            future, wi = wi[0], wi[1:3]
+            func = wi[0]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(DeadlineExceeded(reason))
+        logger.warning('task %s with deadline %.3f dropped: %s',
+                       getattr(func, "__qualname__", func), deadline, reason)
+        self.w_stats.record_drop(wi, reason)
+
+    def wenque(self, item, priority: int = PRIORITY_NORMAL, deadline: float = None):
+        """
+        Queue item for the func of start_workers.
+        :param priority: PRIORITY_* of the task on the worker threads
+        :param deadline: seconds from now after which the task is dropped unless started
+        """
+        if isinstance(item, WorkQ):
+            # Older callers queued a WorkQ holding the func and one item
+            func, item = item.func, item.get()
+        else:
+            func = self.w_func
+        if not self._uses_processes(func):
+            self._put((func, item), priority, deadline)
+            return
+        self._executor()
+        with self._chunk_lock:
+            chunk = self.w_chunks.setdefault(func, [])
+            chunk.append(item)
+            if len(chunk) < self.w_chunksize:
+                return
+            del self.w_chunks[func]
+        self._send_chunk(func, chunk)
+
+    def _send_chunk(self, func: Callable, chunk: list) -> None:
+        """Hand a chunk of wenque items to the processes, blocking while they are busy."""
+        self._inflight.acquire()
+        future = self.w_executor.submit(_run_chunk, func, chunk)
+        future.add_done_callback(self._chunk_done)
+
+    def _chunk_done(self, future: futures.Future) -> None:
+        self._inflight.release()
+        if not future.cancelled() and future.exception() is not None:
+            logger.error('chunk of tasks failed: %s', future.exception())
+
+    def submit(self, func: Callable, *args, **kwargs) -> futures.Future:
+        """
+        Schedule func(*args, **kwargs) on the pool.
+        :return: future holding the return value or the raised exception
+        :raises TypeError: when func of a worker process is not picklable
+        :raises RuntimeError: after end_workers
+        """
+        return self.submit_task(func, args, kwargs)
+
+    def submit_task(self, func: Callable, args: tuple = (), kwargs: dict = None,
+                    priority: int = PRIORITY_NORMAL, deadline: float = None) -> futures.Future:
+        """
+        Schedule func(*args, **kwargs) with a priority and deadline. Worker processes
+        run tasks in submission order and ignore both.
+        :param priority: PRIORITY_* of the task on the worker threads
+        :param deadline: seconds from now after which the task fails with
+            DeadlineExceeded unless started
+        :return: future holding the return value or the raised exception
+        :raises TypeError: when func of a worker process is not picklable
+        :raises RuntimeError: after end_workers
+        """
+        kwargs = kwargs or dict()
+        if self._uses_processes(func):
+            self._check_func(func)
+            return self._executor().submit(func, *args, **kwargs)
+        future = futures.Future()
+        self._put((_run_task, (future, func, args, kwargs)), priority, deadline)
+        return future
 
+    def _put(self, task: tuple, priority: int, deadline: float) -> None:
+        """Queue a (func, item) task of the worker threads."""
+        if self.w_max_workers > self.w_min_workers:
+            self._autoscale()
+        queued = time.monotonic()
+        self.w_workq.put(task + (queued, None if deadline is None else queued + deadline),
+                         priority)
+
+    def map(self, func: Callable, *iterables: Iterable, timeout: float = None,
+            priority: int = PRIORITY_NORMAL, deadline: float = None) -> Iterator:
+        """
+        Submit func for every item of iterables at once and yield the results in
+        order, as concurrent.futures.Executor.map. An exception raised by a task is
+        raised when its result is reached. Worker processes get the items in chunks.
+        :param timeout: seconds to wait for all results, counted from the call
+        :param priority: PRIORITY_* of the tasks on the worker threads
+        :param deadline: seconds from now after which tasks not started fail with
+            DeadlineExceeded
+        """
+        if self._uses_processes(func):
+            self._check_func(func)
+            return self._executor().map(func, *iterables, timeout=timeout,
+                                       chunksize=self.w_chunksize)
+        tasks = [(futures.Future(), func, args, dict()) for args in zip(*iterables)]
+        if self.w_max_workers > self.w_min_workers:
+            self._autoscale()
+        queued = time.monotonic()
+        expires = None if deadline is None else queued + deadline
+        self.w_workq.put_many(((_run_task, task, queued, expires) for task in tasks), priority)
+        return _results([task[0] for task in tasks], timeout)
+
+    @staticmethod
+    def as_completed(fs: Iterable[futures.Future],
+                     timeout: float = None) -> Iterator[futures.Future]:
+        """Yield futures of submit as they complete (finished or failed)."""
+        return futures.as_completed(fs, timeout)
+
+    def __enter__(self):
+        if not self.w_workers and self.w_executor is None:
+            self.start_workers()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end_workers()
+
+    def end_workers(self):
+        if self.w_workq is not None:
+            self.w_workq.join()
+            self.w_workq.close()
+            logger.info('shutdown all workers')
+            logger.info('Joining all threads to main thread')
+            for w in list(self.w_workers):
+                w.join()
+            self.w_workers = []
+        if self.w_executor is not None:
+            # Tasks finished on threads may have queued the last items of a chunk
+            with self._chunk_lock:
+                chunks, self.w_chunks = self.w_chunks, dict()
+            for func, chunk in chunks.items():
+                self._send_chunk(func, chunk)
+            logger.info('shutdown worker processes')
+            self.w_executor.shutdown(wait=True)
+            self.w_executor = None
@@ -28,7 +28,8 @@ pytest_args = split_args(pytest_args)  # sanitize
 target = None
 if proc_name == 'pytest' and '--target' in pytest_args:
     # This condition will execute when args ore in format ['--target=<target name'>]
-    target = list(filter(target_filter.match, pytest_args))[0].split("=")[1].lower()
+    # which split_args has turned into ['--target', '<target name>']
+    target = pytest_args[pytest_args.index('--target') + 1].lower()
 
 if target and proc_name in ["pytest"]:
     _use_ssl = ('-s' if '-s' in pytest_args else (
@@ -20,6 +20,9 @@ from commons import params
 from commons.utils import config_utils
 from commons.utils import system_utils
 from commons.rest_client import RestClient
+from commons.rest_client import close_shared_sessions
+from commons import http_metrics
+from core import durations
 from commons.utils.system_utils import LRUCache
 
 from fixtures.petstore import rest_client
@@ -34,6 +37,9 @@ SKIP_MARKS = ("dataprovider", "test", "run", "skip", "usefixtures",
 
 SKIP_DEBUG_LOGS = []  # Disable debug logs for chatty TP packages
 
+HTTP_METRICS = []  # RequestMetrics of rest calls made by the running test
+http_metrics.add_listener(HTTP_METRICS.append)
+
 
 def _get_items_from_cache():
     """Intended for internal use after modifying collected items."""
@@ -77,6 +83,8 @@ def pytest_sessionfinish(session, exitstatus):
             print("Successfully unmounted directory")
     except Exception as fault:
         LOGGER.exception(fault)
+    close_shared_sessions()
+    save_durations(session)
     filter_report_session_finish(session)
 
 
@@ -172,6 +180,17 @@ def pytest_runtest_makereport(item, call):
         setattr(item, "call_duration", call.duration)
     else:
         setattr(item, "call_duration", call.duration + attr)
+    if report.when == 'setup':
+        HTTP_METRICS.clear()
+    elif report.when == 'call':
+        calls = list(HTTP_METRICS)
+        properties = [("http_requests", len(calls)),
+                      ("http_time", round(sum(rec.total for rec in calls), 6)),
+                      ("http_ttfb", round(sum(rec.ttfb for rec in calls), 6)),
+                      ("http_bytes_sent", sum(rec.request_bytes for rec in calls)),
+                      ("http_bytes_received", sum(rec.response_bytes for rec in calls))]
+        report.user_properties.extend(properties)
+        item.user_properties.extend(properties)
 
     _local = bool(item.config.option.local)
     Globals.LOCAL_RUN = _local
@@ -250,6 +269,17 @@ def pytest_runtest_logreport(report: "TestReport") -> None:
         LOGGER.info("Logs can be uploaded to common location")
 
 
+def save_durations(session):
+    """Merge call_duration of the executed tests into the durations history."""
+    observed = {item.nodeid: item.call_duration for item in session.items
+                if hasattr(item, 'call_duration')}
+    if observed:
+        try:
+            durations.update_durations(observed)
+        except OSError as error:
+            LOGGER.error("Durations history not saved: %s", error)
+
+
 def filter_report_session_finish(session):
     if session.config.option.xmlpath:
         path = session.config.option.xmlpath
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+"""Pytest plugin dumping the collected node ids, used by the parallel runner."""
+
+import os
+
+#: Environment variable naming the file the node ids are written to.
+NODEIDS_FILE_ENV = "COLLECT_NODEIDS_FILE"
+
+
+def pytest_collection_finish(session):
+    """Write one selected node id per line to the file named by NODEIDS_FILE_ENV."""
+    path = os.environ.get(NODEIDS_FILE_ENV)
+    if path:
+        with open(path, "w") as nodeids_file:
+            for item in session.items:
+                nodeids_file.write(item.nodeid + "\n")
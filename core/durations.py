@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""History of test durations and duration balanced scheduling of parallel runs."""
+
+import heapq
+import logging
+import os
+import statistics
+from contextlib import contextmanager
+from typing import Dict
+from typing import List
+
+from commons import params
+from commons.utils import config_utils
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+LOGGER = logging.getLogger(__name__)
+
+#: Seconds assumed for a test without history when nothing else is known.
+DEFAULT_DURATION = 1.0
+#: Weight of the latest observation in the smoothed duration.
+SMOOTHING = 0.5
+
+
+def load_durations(path: str = params.DURATIONS_FILE) -> Dict[str, float]:
+    """
+    Load the smoothed duration per node id.
+    :param path: history file
+    :return: dict of node id to seconds, empty without history
+    """
+    if not os.path.exists(path):
+        return dict()
+    try:
+        return config_utils.read_content_json(path)
+    except ValueError as error:
+        LOGGER.warning("Ignoring corrupt durations history %s: %s", path, error)
+        return dict()
+
+
+@contextmanager
+def _locked(lock_path: str):
+    """
+    Hold an exclusive lock of lock_path. The file is never removed: a writer
+    locking a new file while another holds the unlinked one would not wait.
+    """
+    with open(lock_path, 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def update_durations(observed: Dict[str, float], path: str = params.DURATIONS_FILE,
+                     smoothing: float = SMOOTHING) -> Dict[str, float]:
+    """
+    Merge observed durations into the history as an exponential moving average.
+    The history is locked so that parallel workers can update it at the same time.
+    :param observed: dict of node id to seconds of this run
+    :param path: history file
+    :param smoothing: weight of the new observation
+    :return: updated history
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with _locked(os.path.abspath(path) + '.lock'):
+        history = load_durations(path)
+        for node_id, seconds in observed.items():
+            old = history.get(node_id)
+            history[node_id] = seconds if old is None else \
+                smoothing * seconds + (1 - smoothing) * old
+        tmp_path = path + '.tmp'
+        config_utils.create_content_json(tmp_path, history)
+        os.replace(tmp_path, path)
+    return history
+
+
+def lpt_buckets(node_ids: List[str], nbuckets: int,
+                durations: Dict[str, float]) -> List[List[str]]:
+    """
+    Split node ids into nbuckets of about equal total duration, longest
+    processing time first: every test, longest first, goes to the least loaded bucket.
+    Tests without history are assumed to take the median known duration.
+    :param node_ids: tests to schedule
+    :param nbuckets: number of workers
+    :param durations: dict of node id to seconds
+    :return: list of node id lists, empty buckets are dropped
+    """
+    known = [durations[node_id] for node_id in node_ids if node_id in durations]
+    default = statistics.median(known) if known else DEFAULT_DURATION
+    jobs = sorted(node_ids, key=lambda node_id: durations.get(node_id, default), reverse=True)
+    loads = [(0.0, idx) for idx in range(nbuckets)]
+    buckets = [list() for _ in range(nbuckets)]
+    for node_id in jobs:
+        load, idx = heapq.heappop(loads)
+        buckets[idx].append(node_id)
+        heapq.heappush(loads, (load + durations.get(node_id, default), idx))
+    return [bucket for bucket in buckets if bucket]
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""Spread pytest node ids over worker processes and merge their JUnit results."""
+
+import html
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import List
+
+from core import collect_plugin
+
+LOGGER = logging.getLogger(__name__)
+
+#: pytest exit code when no test got collected.
+NO_TESTS_COLLECTED = 5
+
+
+def collect_tests(marker_expr: str, env: dict = None, options: List[str] = None) -> List[str]:
+    """
+    Collect node ids of tests selected by a marker expression.
+    :param marker_expr: pytest -m expression e.g. 'parallel'
+    :param env: environment of the pytest process
+    :param options: pytest options of the run e.g. --target, applied to collection too
+    :return: list of node ids
+    :raises subprocess.CalledProcessError: when collection fails
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nodeids_path = os.path.join(tmp_dir, "nodeids.txt")
+        env = dict(env or os.environ, **{collect_plugin.NODEIDS_FILE_ENV: nodeids_path})
+        # python -m puts the working directory on sys.path for the -p plugin import
+        cmd_line = [sys.executable, "-m", "pytest"] + list(options or []) + [
+            "--collect-only", "-p", "core.collect_plugin", "-o", "log_cli=false",
+            "-m", marker_expr]
+        LOGGER.debug('Collecting tests %s', cmd_line)
+        result = subprocess.run(cmd_line, env=env, stdout=subprocess.DEVNULL)
+        if result.returncode not in (0, NO_TESTS_COLLECTED):
+            raise subprocess.CalledProcessError(result.returncode, cmd_line)
+        if not os.path.exists(nodeids_path):
+            return []
+        with open(nodeids_path) as nodeids_file:
+            return [line.strip() for line in nodeids_file if line.strip()]
+
+
+def run_buckets(cmd_line: List[str], buckets: List[List[str]], report_dir: str,
+                env: dict = None) -> tuple:
+    """
+    Run one pytest process per bucket concurrently and wait for all of them.
+    Every process gets its own JUnit, pytest-html and log file under report_dir.
+    :param cmd_line: pytest command line without node ids and report options
+    :param buckets: list of node id lists
+    :param report_dir: directory for per worker junit, html and log files
+    :param env: environment of the pytest processes
+    :return: list of return codes, list of junit xml paths
+    """
+    procs, junit_paths = list(), list()
+    for idx, bucket in enumerate(buckets):
+        junit_path = os.path.join(report_dir, "worker_{}.xml".format(idx))
+        log_path = os.path.join(report_dir, "worker_{}.log".format(idx))
+        html_path = os.path.join(report_dir, "worker_{}.html".format(idx))
+        worker_cmd = cmd_line + ["--junitxml=" + junit_path, "--html=" + html_path,
+                                 "--self-contained-html", "-o", "log_file=" + log_path,
+                                 "-p", "no:cacheprovider"] + bucket
+        LOGGER.debug('Starting pytest worker %s with %s tests', idx, len(bucket))
+        procs.append(subprocess.Popen(worker_cmd, env=env))
+        junit_paths.append(junit_path)
+    return [prc.wait() for prc in procs], junit_paths
+
+
+def merge_junit(junit_paths: List[str], out_path: str, name: str = "FrameworkSampler") -> str:
+    """
+    Merge JUnit XML reports into one testsuite.
+    :param junit_paths: reports to merge, missing ones are skipped
+    :param out_path: merged report path
+    :param name: name of the merged testsuite
+    :return: out_path
+    """
+    merged = ET.Element("testsuite", name=name)
+    totals = dict(tests=0, errors=0, failures=0, skipped=0)
+    duration = 0.0
+    for path in junit_paths:
+        if not os.path.exists(path):
+            LOGGER.warning("JUnit report %s not found", path)
+            continue
+        root = ET.parse(path).getroot()
+        suites = [root] if root.tag == "testsuite" else root.findall("testsuite")
+        for suite in suites:
+            for key in totals:
+                totals[key] += int(suite.get(key, 0))
+            duration += float(suite.get("time", 0))
+            merged.extend(suite.findall("testcase"))
+    for key, value in totals.items():
+        merged.set(key, str(value))
+    merged.set("time", "{:.3f}".format(duration))
+    ET.ElementTree(merged).write(out_path, encoding="utf-8", xml_declaration=True)
+    return out_path
+
+
+def write_html_report(junit_path: str, html_path: str, details: List[str] = ()) -> str:
+    """
+    Render a merged JUnit report as a single HTML page.
+    :param junit_path: merged JUnit report
+    :param html_path: html report path
+    :param details: pytest-html reports of the processes, linked from the page
+    :return: html_path
+    """
+    suite = ET.parse(junit_path).getroot()
+    rows = list()
+    for case in suite.findall("testcase"):
+        outcome, detail = "passed", ""
+        for tag in ("failure", "error", "skipped"):
+            node = case.find(tag)
+            if node is not None:
+                outcome = "failed" if tag == "failure" else tag
+                detail = node.get("message") or node.text or ""
+                break
+        rows.append("<tr class='{0}'><td>{1}</td><td>{0}</td><td>{2}</td><td><pre>{3}</pre>"
+                    "</td></tr>".format(outcome, html.escape(
+                        case.get("classname", "") + "::" + case.get("name", "")),
+                                        case.get("time", ""), html.escape(detail)))
+    summary = ", ".join("{} {}".format(suite.get(key), key)
+                        for key in ("tests", "failures", "errors", "skipped"))
+    base = os.path.dirname(os.path.abspath(html_path))
+    links = " ".join("<a href='{0}'>{0}</a>".format(html.escape(os.path.relpath(path, base)))
+                     for path in details if os.path.exists(path))
+    with open(html_path, "w", encoding="utf-8") as report:
+        report.write("<html><head><meta charset='utf-8'><title>{0}</title><style>"
+                     ".passed{{color:green}} .failed,.error{{color:red}} .skipped{{color:gray}}"
+                     "</style></head><body><h1>{0}</h1><p>{1} in {2}s</p><p>{4}</p>"
+                     "<table><tr><th>Test</th><th>Result</th><th>Duration</th><th>Details"
+                     "</th></tr>{3}</table></body></html>".format(
+                         html.escape(suite.get("name", "")), summary, suite.get("time"),
+                         "".join(rows), links))
+    return html_path
@@ -20,6 +20,7 @@ def rest_client(request):
     request.cls.log.info("ENDED: Setup test suite operations.")
     yield request.cls.client
     request.cls.log.info("STARTED: Test suite Teardown operations")
+    request.cls.client.close()
     del request.cls.client
     request.cls.log.info("ENDED: Test suite Teardown operations")
 
@@ -1,8 +1,15 @@
-from typing import List
+from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Iterator
+from typing import List
+import asyncio
 import logging
-import json
 from http import HTTPStatus
+from commons.rest_client import decode_json
+from commons.utils.stream_utils import iter_json_array
+from commons.constants import NWORKERS
+from commons.worker import Workers
 
 
 """
@@ -3541,7 +3548,7 @@ class Pets:
 
         resp = self.rest_client.rest_call("post", endpoint=endpoint, data=pet_data,
                                       headers=self.headers)
-        return json.loads(resp.text)
+        return decode_json(resp)
 
     def create_pets(self, pets: List[Dict]):
         responses = list()
@@ -3549,6 +3556,28 @@ class Pets:
             responses.append(self.create_pet(pet))
         return responses
 
+    def bulk_create_pets(self, pets: List[Dict], concurrency: int = NWORKERS):
+        """
+        Create pets concurrently on a worker pool of at most concurrency threads.
+        A failing create does not stop the batch.
+        :param pets: list of pet bodies
+        :param concurrency: maximum number of creates in flight
+        :return: list of (True, response) or (False, error) in the order of pets
+        """
+        if not pets:
+            return list()
+        results = list()
+        workers = Workers()
+        workers.start_workers(min(concurrency, len(pets)))
+        with workers:
+            for future in [workers.submit(self.create_pet, pet) for pet in pets]:
+                try:
+                    results.append((True, future.result()))
+                except Exception as error:
+                    self.log.error("create pet failed: %s", error)
+                    results.append((False, error))
+        return results
+
     def update_pet_status(self, pet: Dict):
         """
         Update pet's status and other details (Statuses to be considered: available, pending and sold)
@@ -3577,7 +3606,7 @@ class Pets:
         endpoint = self.cmn_cfg.get('target_url') + '/pet'
         resp = self.rest_client.rest_call("put", endpoint=endpoint, data=pet,
                                           headers=self.headers)
-        return json.loads(resp.text)
+        return decode_json(resp)
 
     def find_pet_by_status(self, status='sold'):
         """
@@ -3590,4 +3619,108 @@ class Pets:
         endpoint = self.cmn_cfg.get('target_url') + f'/pet/findByStatus?status={status}'
         resp = self.rest_client.rest_call("get", endpoint=endpoint,
                                           headers=self.headers)
-        return json.loads(resp.text)
+        return decode_json(resp)
+
+    def iter_pets_by_status(self, status='sold', chunk_size=64 * 1024) -> Iterator[Dict]:
+        """
+        Stream pets by status, yielding each pet as soon as it is read from the socket.
+        Call type: GET
+        Endpoint: /pet/findByStatus?status=available
+
+        :param status: available, pending or sold
+        :param chunk_size: bytes read from the socket at a time
+        :return: iterator over pets
+        """
+        endpoint = self.cmn_cfg.get('target_url') + f'/pet/findByStatus?status={status}'
+        resp = self.rest_client.rest_call("get", endpoint=endpoint,
+                                          headers=self.headers, stream=True)
+        try:
+            yield from iter_json_array(resp.iter_content(chunk_size),
+                                       resp.encoding or 'utf-8')
+        finally:
+            resp.close()
+
+    def find_first_pet_by_status(self, predicate: Callable[[Dict], Any],
+                                 status='sold') -> Dict:
+        """
+        Find the first pet of status matching predicate, the rest of the list is not read.
+        :param predicate: callable returning true for the wanted pet
+        :param status: available, pending or sold
+        :return: matching pet or None
+        """
+        pets = self.iter_pets_by_status(status)
+        try:
+            for pet in pets:
+                if predicate(pet):
+                    return pet
+        finally:
+            pets.close()
+        return None
+
+
+class AsyncPets:
+    """Pets library on top of AsyncRestClient, methods are coroutines of Pets ones."""
+
+    def __init__(self, client, cmn_cfg):
+        self.rest_client = client
+        self.cmn_cfg = cmn_cfg
+        self.log = logging.getLogger(__name__)
+        self.headers = {'Content-type': 'application/json',
+                        'Accept': 'application/json'}
+
+    async def create_pet(self, pet_data: Dict):
+        """
+        Create a pet, see Pets.create_pet
+        :param pet_data:
+        :return:
+        """
+        endpoint = self.cmn_cfg.get('target_url') + '/pet'
+        resp = await self.rest_client.rest_call("post", endpoint=endpoint, data=pet_data,
+                                                headers=self.headers)
+        return decode_json(resp)
+
+    async def create_pets(self, pets: List[Dict]):
+        responses = list()
+        for pet in pets:
+            responses.append(await self.create_pet(pet))
+        return responses
+
+    async def bulk_create_pets(self, pets: List[Dict], concurrency: int = NWORKERS):
+        """
+        Create pets concurrently with at most concurrency requests in flight.
+        A failing create does not stop the batch.
+        :param pets: list of pet bodies
+        :param concurrency: maximum number of creates in flight
+        :return: list of (True, response) or (False, error) in the order of pets
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _create(pet):
+            async with semaphore:
+                try:
+                    return True, await self.create_pet(pet)
+                except Exception as error:
+                    self.log.error("create pet %s failed: %s", pet.get('name'), error)
+                    return False, error
+
+        return list(await asyncio.gather(*[_create(pet) for pet in pets]))
+
+    async def update_pet_status(self, pet: Dict):
+        """
+        Update pet's status and other details, see Pets.update_pet_status
+        :return:
+        """
+        endpoint = self.cmn_cfg.get('target_url') + '/pet'
+        resp = await self.rest_client.rest_call("put", endpoint=endpoint, data=pet,
+                                                headers=self.headers)
+        return decode_json(resp)
+
+    async def find_pet_by_status(self, status='sold'):
+        """
+        Get pet by status, see Pets.find_pet_by_status
+        :return:
+        """
+        endpoint = self.cmn_cfg.get('target_url') + f'/pet/findByStatus?status={status}'
+        resp = await self.rest_client.rest_call("get", endpoint=endpoint,
+                                                headers=self.headers)
+        return decode_json(resp)
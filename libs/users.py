@@ -1,8 +1,8 @@
 import logging
-import json
 from http import HTTPStatus
 from typing import List
 from typing import Dict
+from commons.rest_client import decode_json
 
 """
 Create multiple users with array
@@ -58,7 +58,7 @@ class Users:
         endpoint = self.com_config.get('target_url') + '/user/createWithArray'
         resp = self.rest_client.rest_call("post", endpoint=endpoint, data=users_data,
                                       headers=self.headers)
-        return json.loads(resp.text)
+        return decode_json(resp)
 
     def update_user(self, user: Dict):
         """
@@ -83,7 +83,7 @@ class Users:
         endpoint = self.com_config.get('target_url') + f'/user/{username}'
         resp = self.rest_client.rest_call("put", endpoint=endpoint, data=user,
                                       headers=self.headers)
-        return json.loads(resp.text)
+        return decode_json(resp)
 
     def get_user(self, username):
         """
@@ -93,4 +93,47 @@ class Users:
         endpoint = self.com_config.get('target_url') + f'/user/{username}'
         resp = self.rest_client.rest_call("get", endpoint=endpoint,
                                       headers=self.headers)
-        return json.loads(resp.text)
+        return decode_json(resp)
+
+
+class AsyncUsers:
+    """Users library on top of AsyncRestClient, methods are coroutines of Users ones."""
+
+    def __init__(self, client, config):
+        self.rest_client = client
+        self.log = logging.getLogger(__name__)
+        self.com_config = config
+        self.headers = {'Content-type': 'application/json',
+                        'Accept': 'application/json'}
+
+    async def create_multiple_users_with_array(self, users_data: List[Dict]):
+        """
+        Create users, see Users.create_multiple_users_with_array
+        :return:
+        """
+        endpoint = self.com_config.get('target_url') + '/user/createWithArray'
+        resp = await self.rest_client.rest_call("post", endpoint=endpoint, data=users_data,
+                                                headers=self.headers)
+        return decode_json(resp)
+
+    async def update_user(self, user: Dict):
+        """
+        Update a user's username and other details, see Users.update_user
+        :param user:
+        :return:
+        """
+        username = user['username']
+        endpoint = self.com_config.get('target_url') + f'/user/{username}'
+        resp = await self.rest_client.rest_call("put", endpoint=endpoint, data=user,
+                                                headers=self.headers)
+        return decode_json(resp)
+
+    async def get_user(self, username):
+        """
+        Get user by the updated username
+        :return:
+        """
+        endpoint = self.com_config.get('target_url') + f'/user/{username}'
+        resp = await self.rest_client.rest_call("get", endpoint=endpoint,
+                                                headers=self.headers)
+        return decode_json(resp)
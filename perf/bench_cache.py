@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Contention benchmark of the single lock LRUCache against ShardedCache, with
+threads doing 4 reads per store on shared keys. Run from the repository root:
+    python -m perf.bench_cache [nops]
+"""
+import random
+import sys
+import threading
+import time
+
+from commons.utils.system_utils import LRUCache
+from commons.utils.system_utils import ShardedCache
+
+NKEYS = 100000
+
+
+def worker(cache, read, nops: int, barrier: threading.Barrier) -> None:
+    """Do nops operations on cache, 4 reads for every store."""
+    keys = [random.randrange(NKEYS) for _ in range(nops)]
+    barrier.wait()
+    for idx, key in enumerate(keys):
+        if idx % 5:
+            read(cache, key)
+        else:
+            cache.store(key, idx)
+
+
+def bench(cache, read, nthreads: int, nops: int) -> float:
+    """Operations per second of nthreads threads."""
+    for key in range(NKEYS):
+        cache.store(key, key)
+    barrier = threading.Barrier(nthreads + 1)
+    threads = [threading.Thread(target=worker, args=(cache, read, nops // nthreads, barrier))
+               for _ in range(nthreads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return nops / (time.perf_counter() - start)
+
+
+def main(nops: int = 400000) -> None:
+    variants = (("LRUCache.lookup", lambda: LRUCache(NKEYS), LRUCache.lookup),
+                ("ShardedCache.lookup", lambda: ShardedCache(NKEYS), ShardedCache.lookup),
+                ("ShardedCache.peek", lambda: ShardedCache(NKEYS), ShardedCache.peek))
+    print("{:>8} ".format("threads") + " ".join("{:>20}".format(name) for name, _, _ in variants))
+    for nthreads in (1, 4, 16, 64):
+        print("{:>8} ".format(nthreads) + " ".join(
+            "{:>14.0f} op/s".format(bench(factory(), read, nthreads, nops))
+            for _, factory, read in variants))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Time of system_utils file generation against spawning dd per file as
+create_file did before. Run from the repository root:
+    python -m perf.bench_create_file [nfiles] [big_mb]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from commons import constants
+from commons.utils import system_utils
+
+
+def legacy_create_file(fpath: str, count: int, dev: str = "/dev/zero") -> None:
+    """create_file before the rewrite: dd through a shell."""
+    subprocess.run(constants.CREATE_FILE.format(dev, fpath, "1M", count), shell=True,
+                   check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)  # nosec
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(nfiles: int = 100, big_mb: int = 256) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = [os.path.join(tmp_dir, "f{}".format(idx)) for idx in range(nfiles)]
+        big = os.path.join(tmp_dir, "big")
+        cases = (
+            ("{} x 1M dd /dev/zero".format(nfiles),
+             lambda: [legacy_create_file(path, 1) for path in paths]),
+            ("{} x 1M zero".format(nfiles),
+             lambda: [system_utils.generate_file(path, "1M") for path in paths]),
+            ("{} x 1M random, parallel".format(nfiles),
+             lambda: system_utils.create_files(paths, "1M", seed=1)),
+            ("{}M dd /dev/urandom".format(big_mb),
+             lambda: legacy_create_file(big, big_mb, "/dev/urandom")),
+            ("{}M random seeded".format(big_mb),
+             lambda: system_utils.generate_file(big, big_mb * 2 ** 20, "random", seed=1)),
+            ("{}M random + md5".format(big_mb),
+             lambda: system_utils.generate_file(big, big_mb * 2 ** 20, "random", seed=1,
+                                                hash_algo="md5")),
+            ("{}M sparse".format(big_mb),
+             lambda: system_utils.generate_file(big, big_mb * 2 ** 20, "sparse")),
+        )
+        for name, func in cases:
+            print("{:<28} {:>8.3f} s".format(name, timed(func)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark of commons.utils.system_utils.LRUCache against the FIFO cache it
+replaced, on a full cache, and of InMemoryDB.pop_one against the pop_one copying
+all keys. Run from the repository root:
+    python -m perf.bench_lru [nkeys] [ndeletes]
+"""
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+
+from commons.utils.system_utils import InMemoryDB
+from commons.utils.system_utils import LRUCache
+
+
+class LegacyLRUCache:
+    """LRUCache before the rewrite: a deque of keys in insertion order."""
+
+    def __init__(self, size):
+        self.maxsize = size
+        self.fifo = deque()
+        self.table = dict()
+        self._lock = threading.Lock()
+
+    def store(self, key, value):
+        with self._lock:
+            if key not in self.table:
+                self.fifo.append(key)
+            self.table[key] = value
+            if len(self.fifo) > self.maxsize:
+                self.table.pop(self.fifo.popleft(), None)
+
+    def lookup(self, key):
+        with self._lock:
+            return self.table[key]
+
+    def delete(self, key):
+        with self._lock:
+            self.table.pop(key, None)
+            try:
+                self.fifo.remove(key)
+            except ValueError:
+                pass
+
+
+class LegacyInMemoryDB(LegacyLRUCache):
+    """InMemoryDB before the rewrite: pop_one picks from a copy of all keys."""
+
+    def pop_one(self):
+        with self._lock:
+            keys = list(self.table.keys())
+            if not keys:
+                return False, False
+            key = secrets.choice(keys)
+            return key, self.table.pop(key)
+
+
+def timed(func, keys) -> float:
+    """Operations per second of func over keys."""
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    return len(keys) / (time.perf_counter() - start)
+
+
+def bench(cache, nkeys: int, ndeletes: int) -> dict:
+    """Operations per second of store, lookup and delete on a cache of nkeys."""
+    keys = ["key{}".format(idx) for idx in range(nkeys)]
+    result = dict(store=timed(lambda key: cache.store(key, key), keys))
+    result["lookup"] = timed(cache.lookup, keys)
+    # delete from the middle, the legacy deque scans half of it every time
+    result["delete"] = timed(cache.delete, keys[nkeys // 2:nkeys // 2 + ndeletes])
+    return result
+
+
+def main(nkeys: int = 1000000, ndeletes: int = 200) -> None:
+    legacy = bench(LegacyLRUCache(nkeys), nkeys, ndeletes)
+    current = bench(LRUCache(nkeys), nkeys, ndeletes)
+    print("{:>8} {:>14} {:>14} {:>8}".format("op", "legacy op/s", "op/s", "speedup"))
+    for op_name in ("store", "lookup", "delete"):
+        print("{:>8} {:>14.0f} {:>14.0f} {:>7.1f}x".format(
+            op_name, legacy[op_name], current[op_name], current[op_name] / legacy[op_name]))
+    pops = []
+    for mem_db in (LegacyInMemoryDB(nkeys), InMemoryDB(nkeys)):
+        for idx in range(nkeys):
+            mem_db.store(idx, idx)
+        pops.append(timed(lambda _: mem_db.pop_one(), range(ndeletes)))
+    print("{:>8} {:>14.0f} {:>14.0f} {:>7.1f}x".format("pop_one", pops[0], pops[1],
+                                                      pops[1] / pops[0]))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Memory per cached author of dict entries against record_class records, as
+stored in AUTHOR_CACHE of perf/locust_utils.py. Run from the repository root:
+    python -m perf.bench_records [nentries]
+"""
+import random
+import string
+import sys
+import tracemalloc
+
+from commons.utils.record_utils import record_class
+from commons.utils.system_utils import InMemoryDB
+
+Author = record_class("Author", ("id", "idBook", "firstName", "lastName"))
+
+
+def authors(count: int):
+    """Yield author bodies as locust_utils.create_author builds them."""
+    rnd = random.Random(1)
+    for _ in range(count):
+        yield dict(id=rnd.randint(1, 1024 * 1024 * 1024), idBook=rnd.randint(1, 1024 * 1024),
+                   firstName=''.join(rnd.choice(string.ascii_lowercase) for _ in range(10)),
+                   lastName=''.join(rnd.choice(string.ascii_lowercase) for _ in range(5)))
+
+
+def measure(count: int, convert) -> float:
+    """Bytes allocated per entry of an InMemoryDB holding count converted authors."""
+    tracemalloc.start()
+    mem_db = InMemoryDB(count)
+    for author in authors(count):
+        mem_db.store(author["firstName"], convert(author))
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used / count
+
+
+def main(count: int = 200000) -> None:
+    as_dict = measure(count, dict)
+    as_record = measure(count, Author)
+    print("dict {:.0f} B/entry, record {:.0f} B/entry ({:.0f}% less)".format(
+        as_dict, as_record, 100 * (1 - as_record / as_dict)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
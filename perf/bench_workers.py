@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark of commons.worker.Workers task throughput (batch size 1 and 8)
+against the nested queue design it replaced, and of its thread and process
+backends on a CPU bound task. Run from the repository root:
+    python -m perf.bench_workers [ntasks]
+"""
+import hashlib
+import queue
+import sys
+import threading
+import time
+from threading import Thread
+
+from commons.worker import PROCESS
+from commons.worker import THREAD
+from commons.worker import Workers
+
+
+class LegacyWorkQ(queue.Queue):
+    """WorkQ before the redesign: a queue.Queue plus its own semaphore."""
+
+    def __init__(self, func, maxsize):
+        self.lock_req = maxsize != 0
+        self.func = func
+        self.semaphore = threading.Semaphore(maxsize)
+        queue.Queue.__init__(self, maxsize)
+
+    def put(self, item):
+        if self.lock_req:
+            self.semaphore.acquire()
+        queue.Queue.put(self, item)
+
+    def task_done(self):
+        if self.lock_req:
+            self.semaphore.release()
+        queue.Queue.task_done(self)
+
+
+class LegacyWorkers:
+    """Workers before the redesign: one WorkQ per item queued on a WorkQ."""
+
+    def __init__(self):
+        self.w_workers = []
+        self.w_workq = None
+
+    def start_workers(self, nworkers, func=None):
+        self.w_workq = LegacyWorkQ(func, nworkers)
+        for _ in range(nworkers):
+            worker = Thread(target=self.worker)
+            worker.start()
+            self.w_workers.append(worker)
+
+    def worker(self):
+        while True:
+            wq = self.w_workq.get()
+            if wq is None:
+                self.w_workq.task_done()
+                break
+            wi = wq.get()
+            wq.func(wi)
+            wq.task_done()
+            self.w_workq.task_done()
+
+    def wenque(self, item):
+        self.w_workq.put(item)
+
+    def end_workers(self):
+        for _ in self.w_workers:
+            self.w_workq.put(None)
+        self.w_workq.join()
+        for worker in self.w_workers:
+            worker.join()
+
+
+def noop(item):
+    """Task doing nothing, so that the queue overhead is measured."""
+    return item
+
+
+def bench_legacy(nthreads: int, ntasks: int) -> float:
+    """Tasks per second of the legacy pool."""
+    workers = LegacyWorkers()
+    workers.start_workers(nthreads)
+    start = time.perf_counter()
+    for item in range(ntasks):
+        wq = LegacyWorkQ(noop, 0)
+        wq.put(item)
+        workers.wenque(wq)
+    workers.end_workers()
+    return ntasks / (time.perf_counter() - start)
+
+
+def bench_workers(nthreads: int, ntasks: int, batch_size: int = 1) -> float:
+    """Tasks per second of commons.worker.Workers."""
+    workers = Workers()
+    workers.start_workers(nthreads, noop, batch_size=batch_size)
+    start = time.perf_counter()
+    for item in range(ntasks):
+        workers.wenque(item)
+    workers.end_workers()
+    return ntasks / (time.perf_counter() - start)
+
+
+#: Threads or processes of the CPU bound benchmark.
+NPROCS = 4
+
+
+def digest(size):
+    """CPU bound task: hash size bytes in pure python rounds."""
+    data = b"x" * 1024
+    md5 = hashlib.md5()
+    for _ in range(size // 1024):
+        md5.update(data)
+        data = md5.digest() * 64
+    return md5.hexdigest()
+
+
+def bench_backend(backend: str, ntasks: int, size: int = 2 ** 20) -> float:
+    """Tasks per second of a Workers backend on the CPU bound digest task."""
+    workers = Workers(backend)
+    workers.start_workers(NPROCS, chunksize=4)
+    start = time.perf_counter()
+    list(workers.map(digest, [size] * ntasks))
+    workers.end_workers()
+    return ntasks / (time.perf_counter() - start)
+
+
+def main(ntasks: int = 100000) -> None:
+    print("{:>8} {:>6} {:>14} {:>14} {:>8}".format(
+        "threads", "batch", "legacy task/s", "task/s", "speedup"))
+    for nthreads in (1, 8, 32):
+        legacy = bench_legacy(nthreads, ntasks)
+        for batch_size in (1, 8):
+            current = bench_workers(nthreads, ntasks, batch_size)
+            print("{:>8} {:>6} {:>14.0f} {:>14.0f} {:>7.1f}x".format(
+                nthreads, batch_size, legacy, current, current / legacy))
+    thread = bench_backend(THREAD, 200)
+    process = bench_backend(PROCESS, 200)
+    print("cpu bound, {} workers: thread {:.1f} task/s, process {:.1f} task/s ({:.1f}x)".format(
+        NPROCS, thread, process, process / thread))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
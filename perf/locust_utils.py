@@ -2,8 +2,8 @@
 """
 Utility methods of locust test scenarios
 """
+import atexit
 import logging
-import time
 import json
 import random
 import string
@@ -11,11 +11,20 @@ import hashlib
 import pytest
 from locust import events
 from commons.utils import system_utils
+from commons.utils.persistent_db import PersistentDB
+from commons.utils.record_utils import record_class
 from perf import LOCUST_CFG
 from commons.rest_client import RestClient
+from commons.rest_client import decode_json
+from commons.constants import MAX_POOL_CONNECTIONS
 LOGGER = logging.getLogger(__name__)
 
-AUTHOR_CACHE = system_utils.InMemoryDB(1024*1024)
+Author = record_class("Author", ("id", "idBook", "firstName", "lastName"))
+if LOCUST_CFG.get('DEFAULT', 'AUTHOR_DB', fallback=''):
+    AUTHOR_CACHE = PersistentDB(LOCUST_CFG.get('DEFAULT', 'AUTHOR_DB'), decode=Author)
+    atexit.register(AUTHOR_CACHE.close)
+else:
+    AUTHOR_CACHE = system_utils.ShardedCache(1024*1024, segment_cls=system_utils.InMemoryDB)
 
 
 class LocustUtils:
@@ -26,7 +35,10 @@ class LocustUtils:
     def __init__(self):
         self._config = dict()
         self._config["EP_FQDN"] = 'https://fakerestapi.azurewebsites.net'
+        self._config["max_pool_connections"] = LOCUST_CFG.getint(
+            'DEFAULT', 'MAX_POOL_CONNECTIONS', fallback=MAX_POOL_CONNECTIONS)
         self.client = RestClient(self._config)
+        self.client.add_listener(self.fire_locust_event)
         self.headers = {'Content-type': 'application/json',
                         'Accept': 'application/json'}
 
@@ -52,13 +64,21 @@ class LocustUtils:
         return name, object
 
     @staticmethod
-    def total_time(start_time: float) -> float:
+    def fire_locust_event(metrics) -> None:
         """
-        Method to calculate total time for a request to be completed
-        :param start_time: Time when request was initialized
-        :return: Total time take by request
+        Report a rest call to locust with the measured time and sizes.
+        :param metrics: RequestMetrics of the rest call
         """
-        return int((time.time() - start_time) * 1000)
+        response_time = int(metrics.total * 1000)
+        if metrics.error is not None:
+            events.request_failure.fire(request_type=metrics.method, name=metrics.name,
+                                        response_time=response_time,
+                                        response_length=metrics.response_bytes,
+                                        exception=metrics.error)
+        else:
+            events.request_success.fire(request_type=metrics.method, name=metrics.name,
+                                        response_time=response_time,
+                                        response_length=metrics.response_bytes)
 
     def create_author(self):
         """
@@ -80,21 +100,14 @@ class LocustUtils:
         lastname = ''.join(random.choice(string.ascii_lowercase) for i in range(5))
         author_data = dict(id=id, idBook=idbook, firstName=firstname,
                            lastName=lastname)
-        start_time = time.time()
         try:
             resp = self.client.rest_call("post", endpoint=endpoint, data=author_data,
-                                          headers=self.headers)
+                                          headers=self.headers, name="create_author")
         except (BaseException) as error:
             LOGGER.error("create author %s failed: %s", firstname, error)
-            events.request_failure.fire(request_type="post", name="create_author",
-                                        response_time=self.total_time(start_time),
-                                        response_length=1024, exception=error)
         else:
-            events.request_success.fire(request_type="post", name="create_author",
-                                        response_time=self.total_time(start_time),
-                                        response_length=1024)
-            self.store_author(firstname, author_data)
-            return json.loads(resp.text)
+            self.store_author(firstname, Author(author_data))
+            return decode_json(resp)
 
     def update_author(self, name):
         object = AUTHOR_CACHE.lookup(name)
@@ -102,64 +115,43 @@ class LocustUtils:
         author_data = dict(lastName=lastname)
         object.update(author_data)
         endpoint = self._config["EP_FQDN"] + '/api/v1/Authors/' + f"{object['id']}"
-        start_time = time.time()
         try:
-            resp = self.client.rest_call("put", endpoint=endpoint, data=object,
-                                         headers=self.headers)
+            resp = self.client.rest_call("put", endpoint=endpoint, data=object.to_dict(),
+                                         headers=self.headers, name="update_author")
         except (BaseException) as error:
             LOGGER.error("update author %s failed: %s", object['firstName'], error)
-            events.request_failure.fire(request_type="put", name="update_author",
-                                        response_time=self.total_time(start_time),
-                                        response_length=1024, exception=error)
         else:
-            events.request_success.fire(request_type="put", name="update_author",
-                                        response_time=self.total_time(start_time),
-                                        response_length=1024)
             self.store_author(name, object)
-            return json.loads(resp.text)
+            return decode_json(resp)
 
     def get_author(self, name):
         """
         Get user by the updated username
         :return:
         """
-        object = AUTHOR_CACHE.lookup(name)
+        object = AUTHOR_CACHE.peek(name)
         endpoint = self._config["EP_FQDN"] + f"/api/v1/Authors/{object['id']}"
-        start_time = time.time()
         try:
             resp = self.client.rest_call("get", endpoint=endpoint,
-                                          headers=self.headers)
+                                          headers=self.headers, name="get_author")
         except (BaseException) as error:
             LOGGER.error("get author %s failed: %s", object['firstName'], error)
-            events.request_failure.fire(request_type="get", name="get_author",
-                                        response_time=self.total_time(start_time),
-                                        response_length=1024, exception=error)
         else:
-            events.request_success.fire(request_type="get", name="get_author",
-                                        response_time=self.total_time(start_time),
-                                        response_length=1024)
-            return json.loads(resp.text)
+            return decode_json(resp)
 
     def delete_author(self, name):
         """
         Get user by the updated username
         :return:
         """
-        object = AUTHOR_CACHE.lookup(name)
+        object = AUTHOR_CACHE.peek(name)
         endpoint = self._config["EP_FQDN"] + f"/api/v1/Authors/{object['id']}"
-        start_time = time.time()
         try:
             resp = self.client.rest_call("delete", endpoint=endpoint,
-                                          headers=self.headers)
+                                          headers=self.headers, name="delete_author")
         except (BaseException) as error:
             LOGGER.error("delete author %s failed: %s", object['firstName'], error)
-            events.request_failure.fire(request_type="delete", name="delete_author",
-                                        response_time=self.total_time(start_time),
-                                        response_length=1024, exception=error)
         else:
-            events.request_success.fire(request_type="delete", name="delete_author",
-                                        response_time=self.total_time(start_time),
-                                        response_length=1024)
             self.remove_author(name)
 
 
@@ -15,6 +15,8 @@ import logging
 from datetime import datetime
 from commons import params
 from commons import log
+from core import durations
+from core import parallel_runner
 
 LOGGER = logging.getLogger(__name__)
 
@@ -23,7 +25,7 @@ def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("-r", "--html_report", type=str, default='report.html',
                         help="html report name")
-    parser.add_argument("-pe", "--parallel_exec", type=str, default=False,
+    parser.add_argument("-pe", "--parallel_exec", type=str_to_bool, default=False,
                         help="parallel_exec: True for parallel, False for sequential")
     parser.add_argument("-p", "--prc_cnt", type=int, default=2,
                         help="number of parallel processes")
@@ -58,18 +60,12 @@ def str_to_bool(val):
 
 def run_pytest_cmd(args, parallel_exec=False, env=None):
     """Form a pytest command for execution."""
-    if parallel_exec:
-        raise NotImplementedError()
     env['TARGET'] = args.target
-    build, build_type = args.build, args.build_type
-
-    run_type = ''
     log_level = "--log-cli-level=" + str(args.log_level)
     # we intend to use --log-level instead of cli
 
-    report_name = "--html=log/sequential_" + \
-        datetime.utcnow().strftime('%Y-%m-%d_%H-%M-%S-%f') + args.html_report
-    cmd_line = ["pytest", log_level, report_name]
+    run_id = datetime.utcnow().strftime('%Y-%m-%d_%H-%M-%S-%f')
+    cmd_line = ["pytest", log_level]
 
     if args.target:
         cmd_line = cmd_line + ["--target=" + args.target]
@@ -78,21 +74,63 @@ def run_pytest_cmd(args, parallel_exec=False, env=None):
         cmd_line = cmd_line + ["-x"]
 
     cmd_line = cmd_line + ['--validate_certs=' + str(args.validate_certs)]
-    LOGGER.debug('Running pytest engine %s', cmd_line)
-    prc = subprocess.Popen(cmd_line, env=env)
-    prc.communicate()
-    if prc.returncode == 3:
+    if parallel_exec:
+        return_codes = run_parallel(args, cmd_line, run_id, env)
+    else:
+        report_name = "--html=log/sequential_" + run_id + args.html_report
+        cmd_line = cmd_line + [report_name]
+        LOGGER.debug('Running pytest engine %s', cmd_line)
+        prc = subprocess.Popen(cmd_line, env=env)
+        prc.communicate()
+        return_codes = [prc.returncode]
+    if 3 in return_codes:
         print('Exiting test runner due to bad gateway error')
         sys.exit(1)
 
 
+def run_parallel(args, cmd_line, run_id, env=None):
+    """
+    Spread tests marked parallel over args.prc_cnt pytest processes balanced on their
+    recorded durations, then run the remaining (serial) tests in a process of their
+    own. Results of all processes are merged into one JUnit and one HTML report
+    (log/parallel_<run_id>/<html_report>), which links the pytest-html report
+    of every process.
+    :return: list of pytest return codes
+    """
+    report_dir = os.path.join(params.LOG_DIR_NAME, "parallel_" + run_id)
+    os.makedirs(report_dir, exist_ok=True)
+    node_ids = parallel_runner.collect_tests("parallel", env, cmd_line[1:])
+    # Balance processes on the durations recorded by earlier runs
+    buckets = durations.lpt_buckets(node_ids, max(1, args.prc_cnt), durations.load_durations())
+    LOGGER.info('Running %s parallel tests in %s processes', len(node_ids), len(buckets))
+    return_codes, junit_paths = parallel_runner.run_buckets(cmd_line, buckets, report_dir, env)
+
+    serial_junit = os.path.join(report_dir, "serial.xml")
+    serial_cmd = cmd_line + ["-m", "not parallel", "--junitxml=" + serial_junit,
+                             "--html=" + os.path.join(report_dir, "serial.html"),
+                             "--self-contained-html"]
+    LOGGER.debug('Running serial tests %s', serial_cmd)
+    prc = subprocess.Popen(serial_cmd, env=env)
+    prc.communicate()
+    return_codes.append(prc.returncode)
+    junit_paths.append(serial_junit)
+
+    merged = parallel_runner.merge_junit(junit_paths, os.path.join(report_dir, "report.xml"))
+    # every process wrote its pytest-html report next to its JUnit one
+    html_report = parallel_runner.write_html_report(
+        merged, os.path.join(report_dir, args.html_report),
+        [os.path.splitext(path)[0] + ".html" for path in junit_paths])
+    LOGGER.info('Merged reports %s and %s', merged, html_report)
+    return [code for code in return_codes if code != parallel_runner.NO_TESTS_COLLECTED]
+
+
 def trigger_tests(args):
     """
     Trigger tests using pytest
     """
     _env = os.environ.copy()
-    # Sequentially execute all tests with parallel tag which are mentioned in given tag.
-    run_pytest_cmd(args, True, env=_env)
+    # Tests with parallel tag are spread over processes when parallel_exec is set.
+    run_pytest_cmd(args, args.parallel_exec, env=_env)
 
 
 def main(args):
@@ -74,12 +74,12 @@ class TestPets:
         TestCase().assertDictEqual(resp, pet)
         self.log.debug(f"Updated pet {pet['name']} successfully")
         # get pet by available status
-        resp = pets_obj.find_pet_by_status()
-        for pitem in resp:
-            if 'name' in pitem and pitem['name'] == pet['name']:
-                assert_that(pitem['status']).is_equal_to('sold')
-                self.log.info(f"Got pet with status {pet['status']}")
-                # additional verification could be added or test could be seperated
+        pitem = pets_obj.find_first_pet_by_status(
+            lambda item: item.get('name') == pet['name'])
+        if pitem:
+            assert_that(pitem['status']).is_equal_to('sold')
+            self.log.info(f"Got pet with status {pet['status']}")
+            # additional verification could be added or test could be seperated
 
 
 
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+"""Fixtures shared by the framework unit tests."""
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serve canned responses from server.routes keyed by (method, path)."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _serve(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.body = body
+        self.server.requests.append((self.command, self.path, dict(self.headers), body))
+        route = self.server.routes.get((self.command, self.path.split("?")[0]))
+        if callable(route):
+            route = route(self)
+        status, headers, payload = route or (404, {}, b"")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = do_HEAD = _serve
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """Local HTTP server, tests register routes on http_server.routes."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.routes = dict()
+    server.requests = list()
+    server.url = "http://127.0.0.1:{}".format(server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
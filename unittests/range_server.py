@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+"""Route of the http_server fixture serving an object by byte ranges."""
+
+
+def serve_ranges(data: bytes):
+    """Route callable serving data with HEAD and single Range GET support."""
+
+    def route(handler):
+        if handler.command == "HEAD":
+            return 200, {"Accept-Ranges": "bytes"}, data
+        spec = handler.headers.get("Range")
+        if not spec:
+            return 200, {}, data
+        start, end = (int(pos) for pos in spec.split("=", 1)[1].split("-"))
+        end = min(end, len(data) - 1)
+        return 206, {"Content-Range": "bytes {}-{}/{}".format(start, end, len(data))}, \
+            data[start:end + 1]
+
+    return route
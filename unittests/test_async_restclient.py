@@ -0,0 +1,34 @@
+"""Test asyncio Rest Client and libraries."""
+import asyncio
+import json
+
+from commons.async_rest_client import AsyncRestClient
+from libs.pets import AsyncPets
+
+
+class TestAsyncRestClient:
+    """Test AsyncRestClient against a local server."""
+
+    def test_rest_call_get(self, http_server):
+        http_server.routes[("GET", "/pet/findByStatus")] = (
+            200, {"Content-Type": "application/json"}, b'[{"name": "doggie"}]')
+
+        async def run():
+            async with AsyncRestClient(dict(EP_FQDN=http_server.url)) as client:
+                pets = AsyncPets(client, dict(target_url=http_server.url))
+                return await asyncio.gather(*[pets.find_pet_by_status() for _ in range(8)])
+
+        for resp in asyncio.run(run()):
+            assert resp == [{"name": "doggie"}]
+
+    def test_rest_call_post_data(self, http_server):
+        http_server.routes[("POST", "/pet")] = (200, {}, b'{"id": 1}')
+
+        async def run():
+            async with AsyncRestClient(dict(EP_FQDN=http_server.url)) as client:
+                return await client.rest_call("post", endpoint=http_server.url + "/pet",
+                                              data={"id": 1})
+
+        resp = asyncio.run(run())
+        assert resp.status_code == 200
+        assert json.loads(http_server.requests[0][3]) == {"id": 1}
@@ -0,0 +1,83 @@
+"""Test asyncio command execution."""
+import asyncio
+import glob
+import sys
+import time
+
+import pytest
+
+from commons.utils import cmd_utils
+
+PRINT_LINES = "import sys\nfor idx in range(5):\n    print(idx, flush=True)\n" \
+              "print('oops', file=sys.stderr)\nsys.exit(3)"
+
+
+def live_members(pgid: int) -> list:
+    """Pids of the processes of a process group which are not zombies."""
+    pids = list()
+    for stat_path in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(stat_path) as stat_file:
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == pgid and fields[0] != "Z":
+            pids.append(stat_path.split("/")[2])
+    return pids
+
+
+class TestRunCmd:
+    """Test run_cmd streaming, timeouts and concurrency."""
+
+    def test_stream_lines(self):
+        lines = list()
+        result = asyncio.run(cmd_utils.run_cmd(
+            [sys.executable, "-c", PRINT_LINES], on_line=lambda *line: lines.append(line),
+            keep_lines=2))
+        assert result.returncode == 3 and not result.ok
+        assert result.stdout == ["3", "4"] and result.stderr == ["oops"]
+        assert [line for stream, line in lines if stream == "stdout"] == \
+            ["0", "1", "2", "3", "4"]
+
+    def test_shell_and_split(self):
+        result = asyncio.run(cmd_utils.run_cmd("echo a b | tr a-z A-Z"))
+        assert result.ok and result.stdout == ["A B"]
+        result = asyncio.run(cmd_utils.run_cmd("echo 'a | b'", shell=False))
+        assert result.stdout == ["a | b"]
+
+    def test_timeout_kills_shell_children(self):
+        start = time.monotonic()
+        result = asyncio.run(cmd_utils.run_cmd("echo started; sleep 30", timeout=0.5))
+        assert result.timed_out and not result.ok
+        assert result.stdout == ["started"]
+        assert time.monotonic() - start < 10
+
+    def test_run_commands_concurrently(self):
+        start = time.monotonic()
+        results = cmd_utils.run_commands(
+            [[sys.executable, "-c", "import time; time.sleep(0.5); print(%d)" % idx]
+             for idx in range(4)], concurrency=4)
+        assert [result.stdout for result in results] == [["0"], ["1"], ["2"], ["3"]]
+        assert time.monotonic() - start < 1.8
+
+    def test_long_line_kept_whole(self):
+        size = 3 * 1024 * 1024
+        lines = list()
+        result = asyncio.run(cmd_utils.run_cmd(
+            [sys.executable, "-c", "print('x' * %d); print('tail')" % size],
+            on_line=lambda *line: lines.append(line)))
+        assert result.ok
+        assert sum(len(line) for _, line in lines[:-1]) == size
+        assert lines[-1] == ("stdout", "tail")
+
+    def test_failing_callback_stops_command(self):
+        pgids = list()
+
+        def on_line(stream, line):
+            pgids.append(int(line))
+            raise ValueError(line)
+
+        with pytest.raises(ValueError):
+            asyncio.run(cmd_utils.run_cmd("echo $$; sleep 20", on_line=on_line))
+        # the shell leads the process group of the command, sleep included
+        assert live_members(pgids[0]) == []
@@ -0,0 +1,69 @@
+"""Test manifest builder."""
+import hashlib
+import json
+import os
+
+from commons.utils import manifest_utils
+from commons.utils import system_utils
+
+
+class TestManifest:
+    """Test build_manifest hashing and digest reuse."""
+
+    def test_build_and_reuse(self, tmp_path, monkeypatch):
+        data_dir = tmp_path / "data"
+        (data_dir / "sub").mkdir(parents=True)
+        (data_dir / "a.bin").write_bytes(b"a" * 5000)
+        (data_dir / "sub" / "b.bin").write_bytes(b"b" * 10)
+        manifest = str(tmp_path / "manifest.json")
+        files = manifest_utils.build_manifest(str(data_dir), manifest, "sha256",
+                                              nworkers=4, memory_budget=2 ** 20)
+        assert files[os.path.join("sub", "b.bin")]["digest"] == \
+            hashlib.sha256(b"b" * 10).hexdigest()
+        with open(manifest) as saved:
+            assert json.load(saved) == dict(algo="sha256", files=files)
+
+        hashed = list()
+        calc_checksum = system_utils.calc_checksum
+        monkeypatch.setattr(system_utils, "calc_checksum",
+                            lambda path, *args, **kwargs: hashed.append(path) or
+                            calc_checksum(path, *args, **kwargs))
+        (data_dir / "a.bin").write_bytes(b"c" * 5001)
+        files = manifest_utils.build_manifest(str(data_dir), manifest, "sha256")
+        assert hashed == [str(data_dir / "a.bin")]
+        assert files["a.bin"] == dict(size=5001, mtime=os.stat(data_dir / "a.bin").st_mtime_ns,
+                                      digest=hashlib.sha256(b"c" * 5001).hexdigest())
+        manifest_utils.build_manifest(str(data_dir), manifest, "md5")
+        assert len(hashed) == 3
+
+    def test_errors_changes_and_vanished_files(self, tmp_path, monkeypatch):
+        for name in ("ok", "locked", "growing", "gone"):
+            (tmp_path / name).write_bytes(name.encode())
+        calc_checksum = system_utils.calc_checksum
+
+        def flaky(path, *args, **kwargs):
+            name = os.path.basename(path)
+            if name == "locked":
+                raise PermissionError(13, "Permission denied", path)
+            if name == "growing":
+                with open(path, "ab") as out:
+                    out.write(b"+")
+            if name == "gone":
+                os.remove(path)
+            return calc_checksum(path, *args, **kwargs)
+
+        monkeypatch.setattr(system_utils, "calc_checksum", flaky)
+        manifest = str(tmp_path / "manifest.json")
+        files = manifest_utils.build_manifest(str(tmp_path), manifest, nworkers=2)
+        assert sorted(files) == ["growing", "locked", "ok"]
+        assert files["ok"]["digest"] == hashlib.md5(b"ok").hexdigest()
+        assert files["locked"]["digest"] is None and "denied" in files["locked"]["error"]
+        assert files["growing"]["digest"] is None and files["growing"]["size"] == 8
+
+    def test_manifest_inside_root(self, tmp_path):
+        (tmp_path / "a.bin").write_bytes(b"a")
+        manifest = str(tmp_path / "MANIFEST.json")
+        (tmp_path / "MANIFEST.json.tmp").write_text("{}")  # left over by a crashed build
+        first = manifest_utils.build_manifest(str(tmp_path), manifest)
+        assert manifest_utils.build_manifest(str(tmp_path), manifest) == first
+        assert sorted(first) == ["a.bin"]
@@ -0,0 +1,70 @@
+"""Test parallel runner helpers."""
+import multiprocessing
+import os
+import subprocess
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from core import durations
+from core import parallel_runner
+
+
+class TestParallelRunner:
+    """Test collection, bucketing and report merging."""
+
+    def test_collect_failure_raises(self):
+        with pytest.raises(subprocess.CalledProcessError):
+            parallel_runner.collect_tests("parallel", options=["--no-such-option"])
+
+    def test_merge_junit(self, tmp_path):
+        worker = tmp_path / "worker_0.xml"
+        worker.write_text('<testsuite tests="2" failures="1" time="1.5">'
+                          '<testcase classname="t" name="a"/>'
+                          '<testcase classname="t" name="b"><failure message="boom"/></testcase>'
+                          '</testsuite>')
+        serial = tmp_path / "serial.xml"
+        serial.write_text('<testsuites><testsuite tests="1" skipped="1" time="0.5">'
+                          '<testcase classname="t" name="c"><skipped/></testcase>'
+                          '</testsuite></testsuites>')
+        merged = parallel_runner.merge_junit(
+            [str(worker), str(serial), str(tmp_path / "missing.xml")],
+            str(tmp_path / "report.xml"))
+        root = ET.parse(merged).getroot()
+        assert (root.get("tests"), root.get("failures"), root.get("skipped")) == ("3", "1", "1")
+        assert [case.get("name") for case in root] == ["a", "b", "c"]
+        (tmp_path / "worker_0.html").write_text("<html/>")
+        page = parallel_runner.write_html_report(
+            merged, str(tmp_path / "report.html"),
+            [str(tmp_path / "worker_0.html"), str(tmp_path / "serial.html")])
+        with open(page) as report:
+            content = report.read()
+        assert "boom" in content and "3 tests" in content
+        assert "href='worker_0.html'" in content and "serial.html" not in content
+
+    def test_lpt_buckets(self):
+        history = dict(a=8, b=7, c=6, d=5, e=4)
+        buckets = durations.lpt_buckets(list("abcdef"), 2, history)
+        # f has no history and counts as the median, 6 seconds
+        loads = [sum(history.get(node_id, 6) for node_id in bucket) for bucket in buckets]
+        assert loads == [18, 18]
+        assert durations.lpt_buckets(["a"], 3, dict()) == [["a"]]
+
+    def test_update_durations(self, tmp_path):
+        path = str(tmp_path / "log" / "durations.json")
+        durations.update_durations(dict(a=2.0), path)
+        history = durations.update_durations(dict(a=4.0, b=1.0), path)
+        assert history == dict(a=3.0, b=1.0) == durations.load_durations(path)
+
+    def test_update_durations_concurrently(self, tmp_path):
+        path = str(tmp_path / "durations.json")
+        procs = [multiprocessing.Process(
+            target=durations.update_durations,
+            args=({"t{}_{}".format(idx, num): 1.0 for num in range(50)}, path))
+            for idx in range(6)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join(30)
+        assert len(durations.load_durations(path)) == 300
+        assert os.path.exists(path + ".lock")
@@ -0,0 +1,69 @@
+"""Test sqlite backed PersistentDB."""
+import sqlite3
+
+from commons.utils.persistent_db import PersistentDB
+from commons.utils.record_utils import record_class
+
+Author = record_class("Author", ("id", "firstName"))
+
+
+def file_count(path):
+    """Entries written to the file so far."""
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+
+class TestPersistentDB:
+    """Test write through, reopen and random pop."""
+
+    def test_batched_write_and_reopen(self, tmp_path):
+        path = str(tmp_path / "authors.db")
+        with PersistentDB(path, size=2, batch_size=3, decode=Author) as mem_db:
+            mem_db.store("ann", Author(id=1, firstName="ann"))
+            mem_db.store("bob", Author(id=2, firstName="bob"))
+            assert file_count(path) == 0
+            mem_db.store("cid", Author(id=3, firstName="cid"))
+            assert file_count(path) == 3
+            assert mem_db.lookup("ann") == dict(id=1, firstName="ann")
+            mem_db.delete("bob")
+        with PersistentDB(path, decode=Author) as mem_db:
+            assert sorted(mem_db.get_keys()) == ["ann", "cid"]
+            author = mem_db.lookup("cid")
+            assert isinstance(author, Author) and author["id"] == 3
+            assert mem_db.lookup("cid") is author
+
+    def test_pop_one(self, tmp_path):
+        path = str(tmp_path / "ids.db")
+        with PersistentDB(path) as mem_db:
+            for idx in range(10):
+                mem_db.store(idx, dict(id=idx))
+        popped = list()
+        with PersistentDB(path, batch_size=1) as mem_db:
+            for _ in range(10):
+                popped.append(mem_db.pop_one())
+            assert mem_db.pop_one() == (False, False)
+            assert len(mem_db) == 0
+        assert sorted(popped) == [(idx, dict(id=idx)) for idx in range(10)]
+
+    def test_pop_one_shared_file(self, tmp_path):
+        path = str(tmp_path / "ids.db")
+        with PersistentDB(path, batch_size=1) as first, \
+                PersistentDB(path, batch_size=1) as second:
+            for idx in range(20):
+                first.store(idx, idx)
+            # second pops from the file what first still holds in its hot tier
+            popped = [second.pop_one()[0] for _ in range(10)]
+            while True:
+                key = first.pop_one()[0]
+                if key is False:
+                    break
+                popped.append(key)
+            assert sorted(popped) == list(range(20))
+            assert second.pop_one() == (False, False)
+
+    def test_none_value(self, tmp_path):
+        path = str(tmp_path / "none.db")
+        with PersistentDB(path) as mem_db:
+            mem_db.store("empty", None)
+        with PersistentDB(path) as mem_db:
+            assert mem_db.lookup("empty") is None
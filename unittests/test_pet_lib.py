@@ -0,0 +1,56 @@
+"""Test Pets library."""
+import asyncio
+import json
+
+from commons.rest_client import RestClient
+from commons.async_rest_client import AsyncRestClient
+from libs.pets import Pets
+from libs.pets import AsyncPets
+
+
+def echo_pet(handler):
+    """Echo the posted pet back, pets named 'bad' get a non JSON answer."""
+    pet = json.loads(handler.body)
+    if pet["name"] == "bad":
+        return 500, {}, b"Internal Server Error"
+    return 200, {"Content-Type": "application/json"}, json.dumps(pet).encode()
+
+
+class TestPetLib:
+    """Test Pets library against a local server."""
+
+    pets = [dict(id=idx, name="bad" if idx == 3 else f"pet{idx}") for idx in range(20)]
+
+    def test_bulk_create_pets(self, http_server):
+        http_server.routes[("POST", "/pet")] = echo_pet
+        client = RestClient(dict(EP_FQDN=http_server.url, shared_session=False))
+        results = Pets(client, dict(target_url=http_server.url)).bulk_create_pets(
+            self.pets, concurrency=4)
+        client.close()
+        assert [resp["id"] for passed, resp in results if passed] == \
+            [pet["id"] for pet in self.pets if pet["name"] != "bad"]
+        assert not results[3][0] and isinstance(results[3][1], ValueError)
+
+    def test_async_bulk_create_pets(self, http_server):
+        http_server.routes[("POST", "/pet")] = echo_pet
+
+        async def run():
+            async with AsyncRestClient(dict(EP_FQDN=http_server.url)) as client:
+                pets = AsyncPets(client, dict(target_url=http_server.url))
+                return await pets.bulk_create_pets(self.pets, concurrency=4)
+
+        results = asyncio.run(run())
+        assert [resp["id"] for passed, resp in results if passed] == \
+            [pet["id"] for pet in self.pets if pet["name"] != "bad"]
+        assert not results[3][0]
+
+    def test_find_first_pet_by_status(self, http_server):
+        pets = [dict(id=idx, name=f"pet{idx}", status="sold") for idx in range(100)]
+        http_server.routes[("GET", "/pet/findByStatus")] = (
+            200, {"Content-Type": "application/json"}, json.dumps(pets).encode())
+        client = RestClient(dict(EP_FQDN=http_server.url, shared_session=False))
+        pets_obj = Pets(client, dict(target_url=http_server.url))
+        assert pets_obj.find_first_pet_by_status(lambda pet: pet["name"] == "pet42") == pets[42]
+        assert pets_obj.find_first_pet_by_status(lambda pet: pet["name"] == "none") is None
+        assert list(pets_obj.iter_pets_by_status()) == pets
+        client.close()
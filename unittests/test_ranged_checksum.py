@@ -0,0 +1,82 @@
+"""Test ranged parallel checksums against a local Range capable server."""
+import gzip
+import hashlib
+import os
+
+import pytest
+
+from commons.utils import ranged_checksum
+from commons.utils.ranged_checksum import HTTPRangeFetcher
+from unittests.range_server import serve_ranges
+
+MIB = 1024 * 1024
+
+
+def multipart_etag(data, part_size):
+    """ETag S3 gives data uploaded in parts of part_size."""
+    parts = [hashlib.md5(data[pos:pos + part_size]).digest()
+             for pos in range(0, len(data), part_size)]
+    return '"{}-{}"'.format(hashlib.md5(b"".join(parts)).hexdigest(), len(parts))
+
+
+class TestRangedChecksum:
+    """Test composite digests and ETag checks."""
+
+    def test_composite(self, http_server):
+        data = os.urandom(5 * MIB + 123)
+        http_server.routes[("GET", "/obj")] = http_server.routes[("HEAD", "/obj")] = \
+            serve_ranges(data)
+        fetcher = HTTPRangeFetcher(http_server.url + "/obj")
+        result = ranged_checksum.ranged_checksum(fetcher, 2 * MIB, nworkers=3)
+        assert result["size"] == len(data)
+        assert result["parts"][2] == hashlib.md5(data[4 * MIB:]).hexdigest()
+        assert '"{}"'.format(result["composite"]) == multipart_etag(data, 2 * MIB)
+        ranges = sorted(headers["Range"] for method, _, headers, _ in http_server.requests
+                        if method == "GET")
+        assert ranges == ["bytes=0-2097151", "bytes=2097152-4194303",
+                          "bytes=4194304-5243002"]
+        sha = ranged_checksum.ranged_checksum(fetcher, 4 * MIB, "sha256")
+        assert sha["parts"][1] == hashlib.sha256(data[4 * MIB:]).hexdigest()
+
+    def test_verify_etag(self, http_server):
+        data = os.urandom(3 * MIB + 5)
+        http_server.routes[("GET", "/obj")] = http_server.routes[("HEAD", "/obj")] = \
+            serve_ranges(data)
+        fetcher = HTTPRangeFetcher(http_server.url + "/obj")
+        assert ranged_checksum.verify_etag(fetcher, multipart_etag(data, MIB))
+        assert ranged_checksum.verify_etag(fetcher, hashlib.md5(data).hexdigest())
+        assert not ranged_checksum.verify_etag(fetcher, multipart_etag(data[:-1] + b"x", MIB))
+
+    def test_verify_etag_default_part_size(self, http_server):
+        data = os.urandom(20 * MIB)
+        http_server.routes[("GET", "/obj")] = http_server.routes[("HEAD", "/obj")] = \
+            serve_ranges(data)
+        fetcher = HTTPRangeFetcher(http_server.url + "/obj")
+        etag = multipart_etag(data, 8 * MIB)
+        assert etag.endswith('-3"')
+        assert ranged_checksum.part_sizes_from_etag(etag, len(data))[0] == 8 * MIB
+        assert ranged_checksum.verify_etag(fetcher, etag)
+        assert ranged_checksum.verify_etag(fetcher, multipart_etag(data, 7 * MIB),
+                                           part_size=7 * MIB)
+
+    def test_gzip_range_decoded(self, http_server):
+        data = os.urandom(1000)
+        gzipped = gzip.compress(data)
+        http_server.routes[("HEAD", "/obj")] = (200, {}, data)
+        http_server.routes[("GET", "/obj")] = (206, {"Content-Encoding": "gzip"}, gzipped)
+        result = ranged_checksum.ranged_checksum(HTTPRangeFetcher(http_server.url + "/obj"))
+        assert result["parts"] == [hashlib.md5(data).hexdigest()]
+
+    def test_incomplete_fetcher(self):
+        class SizeOnly(ranged_checksum.RangeFetcher):
+            def size(self):
+                return 0
+
+        with pytest.raises(TypeError):
+            SizeOnly()
+
+    def test_range_ignored(self, http_server):
+        http_server.routes[("HEAD", "/obj")] = (200, {}, b"abc")
+        http_server.routes[("GET", "/obj")] = (200, {}, b"abc")
+        with pytest.raises(ValueError):
+            ranged_checksum.ranged_checksum(HTTPRangeFetcher(http_server.url + "/obj"))
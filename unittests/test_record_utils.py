@@ -0,0 +1,49 @@
+"""Test compact records."""
+import json
+import pickle
+
+import pytest
+
+from commons.utils.record_utils import record_class
+
+Author = record_class("Author", ("id", "idBook", "firstName", "lastName"),
+                      interned=("lastName",))
+
+
+class TestRecord:
+    """Test Record mapping interface."""
+
+    def test_mapping(self):
+        author = Author(id=1, idBook=2, firstName="ann")
+        assert author["id"] == 1 and author.idBook == 2
+        assert dict(author) == dict(id=1, idBook=2, firstName="ann")
+        assert "lastName" not in author and len(author) == 3
+        author.update(dict(lastName="lee"))
+        assert author == dict(id=1, idBook=2, firstName="ann", lastName="lee")
+        assert json.loads(json.dumps(author.to_dict()))["lastName"] == "lee"
+        assert not hasattr(author, "__dict__")
+        with pytest.raises(KeyError):
+            author["age"] = 3
+        with pytest.raises(KeyError):
+            author["age"]
+
+    def test_intern_and_pickle(self):
+        last = "".join(["le", "e"])
+        author = Author(lastName=last, id=5)
+        assert author["lastName"] is Author(lastName="lee")["lastName"]
+        clone = pickle.loads(pickle.dumps(author))
+        assert type(clone) is Author and clone == author
+
+    def test_mutable_mapping(self):
+        author = Author(id=1, firstName="ann")
+        del author["firstName"]
+        assert author.pop("id") == 1 and len(author) == 0
+        assert author.setdefault("lastName", "lee") == "lee"
+        with pytest.raises(KeyError):
+            del author["age"]
+
+    def test_pickle_local_class(self):
+        pet = record_class("Pet", ("id", "status"))(id=7, status="sold")
+        clone = pickle.loads(pickle.dumps(pet))
+        assert type(clone) is type(pet) is record_class("Pet", ("id", "status"))
+        assert clone == dict(id=7, status="sold")
@@ -1,5 +1,21 @@
 """Test Rest Client."""
 
+import socket
+
+import requests
+from commons.rest_client import RestClient
+from commons.rest_client import decode_json
+
+
+def make_response(body: bytes, status: int = 200) -> requests.Response:
+    """Build a response object without hitting the network."""
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.encoding = "utf-8"
+    return response
+
+
 class TestRestClient:
     """Test S3 utility library class."""
 
@@ -10,4 +26,122 @@ class TestRestClient:
         pass
 
     def test_rest_client_get(self):
-        pass
\ No newline at end of file
+        pass
+
+    def test_rest_client_shared_pool(self):
+        config = dict(EP_FQDN="http://localhost", max_pool_connections=7)
+        client1, client2 = RestClient(config), RestClient(dict(config))
+        assert client1.session is client2.session
+        adapter = client1.session.get_adapter("http://localhost")
+        assert adapter._pool_maxsize == 7
+
+    def test_rest_client_own_pool(self):
+        config = dict(EP_FQDN="http://localhost", shared_session=False)
+        client1, client2 = RestClient(config), RestClient(config)
+        assert client1.session is not client2.session
+        client1.close()
+        client2.close()
+
+    def test_decode_json_cached(self):
+        response = make_response(b'[{"name": "doggie"}]')
+        body = decode_json(response)
+        assert body == [{"name": "doggie"}]
+        assert decode_json(response) is body
+
+    def test_response_cache(self, http_server):
+        http_server.routes[("GET", "/user/x")] = (200, {}, b'{"id": 1}')
+        http_server.routes[("PUT", "/user/x")] = (200, {}, b'{}')
+        url = http_server.url + "/user/x"
+        client = RestClient(dict(EP_FQDN=http_server.url, shared_session=False,
+                                 response_cache=dict(maxsize=2, ttl=60)))
+        for _ in range(3):
+            assert decode_json(client.rest_call("get", endpoint=url)) == {"id": 1}
+        assert len(http_server.requests) == 1
+        client.rest_call("put", endpoint=url, data={})
+        client.rest_call("get", endpoint=url)
+        assert len(http_server.requests) == 3
+        client.close()
+
+    def test_response_cache_etag(self, http_server):
+        def conditional(handler):
+            if handler.headers.get("If-None-Match") == '"v1"':
+                return 304, {"ETag": '"v1"'}, b''
+            return 200, {"ETag": '"v1"'}, b'[1, 2, 3]'
+
+        http_server.routes[("GET", "/pet/findByStatus")] = conditional
+        url = http_server.url + "/pet/findByStatus"
+        client = RestClient(dict(EP_FQDN=http_server.url, shared_session=False,
+                                 response_cache=dict(ttl=0)))
+        assert decode_json(client.rest_call("get", endpoint=url)) == [1, 2, 3]
+        resp = client.rest_call("get", endpoint=url)
+        assert resp.status_code == 200 and decode_json(resp) == [1, 2, 3]
+        assert http_server.requests[1][2]["If-None-Match"] == '"v1"'
+        assert client.cache.revalidations == 1
+        client.close()
+
+    def test_response_cache_params_and_failed_write(self, http_server):
+        http_server.routes[("GET", "/pet/findByStatus")] = (200, {}, b'[1]')
+        http_server.routes[("PUT", "/pet/findByStatus")] = (400, {}, b'{}')
+        url = http_server.url + "/pet/findByStatus"
+        client = RestClient(dict(EP_FQDN=http_server.url, shared_session=False,
+                                 response_cache=dict(ttl=60)))
+        client.rest_call("get", endpoint=url, params={"status": ["sold", "pending"]})
+        client.rest_call("get", endpoint=url, params=[("status", "sold"), ("status", "pending")])
+        client.rest_call("put", endpoint=url, data={})
+        client.rest_call("get", endpoint=url, params={"status": ["sold", "pending"]})
+        assert [request[0] for request in http_server.requests] == ["GET", "PUT"]
+        client.close()
+
+    def test_response_cache_evicted_revalidation(self, http_server):
+        client = RestClient(dict(EP_FQDN=http_server.url, shared_session=False,
+                                 response_cache=dict(ttl=0)))
+
+        def conditional(handler):
+            if handler.headers.get("If-None-Match") == '"v1"':
+                client.cache.clear()
+                return 304, {"ETag": '"v1"'}, b''
+            return 200, {"ETag": '"v1"'}, b'[1, 2, 3]'
+
+        http_server.routes[("GET", "/pet/findByStatus")] = conditional
+        url = http_server.url + "/pet/findByStatus"
+        client.rest_call("get", endpoint=url)
+        resp = client.rest_call("get", endpoint=url)
+        assert resp.status_code == 200 and decode_json(resp) == [1, 2, 3]
+        assert [request[2].get("If-None-Match") for request in http_server.requests] == \
+            [None, '"v1"', None]
+        client.close()
+
+    def test_request_metrics(self, http_server):
+        http_server.routes[("POST", "/pet")] = (200, {}, b'{"id": 1}' * 100)
+        records = list()
+        client = RestClient(dict(EP_FQDN=http_server.url, shared_session=False))
+        client.add_listener(records.append)
+        for _ in range(2):
+            client.rest_call("post", endpoint=http_server.url + "/pet", data={"id": 1},
+                             name="create_pet")
+        first, second = records
+        assert first.name == "create_pet" and first.status_code == 200
+        assert first.connect > 0 and second.connect == 0  # keep-alive reuse
+        assert first.dns is None  # resolution is part of connect
+        assert 0 < first.ttfb <= first.total
+        assert first.response_bytes > 900 and first.request_bytes > len('{"id": 1}')
+        client.close()
+
+    def test_connect_falls_through_addresses(self, http_server, monkeypatch):
+        http_server.routes[("GET", "/pet")] = (200, {}, b'{}')
+        port = http_server.server_address[1]
+        getaddrinfo = socket.getaddrinfo
+
+        def resolve(host, *args, **kwargs):
+            if host != "pets.test":
+                return getaddrinfo(host, *args, **kwargs)
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (addr, port))
+                    for addr in ("127.0.0.2", "127.0.0.1")]
+
+        monkeypatch.setattr(socket, "getaddrinfo", resolve)
+        records = list()
+        client = RestClient(dict(EP_FQDN="http://pets.test", shared_session=False))
+        client.add_listener(records.append)
+        resp = client.rest_call("get", endpoint="http://pets.test:{}/pet".format(port))
+        assert resp.status_code == 200 and records[0].connect > 0
+        client.close()
@@ -0,0 +1,62 @@
+"""Test retry policies."""
+import itertools
+
+import pytest
+
+from commons.rest_client import RestClient
+from commons.retry import RetryPolicy
+
+
+def flaky(statuses):
+    """Route answering with the given statuses in turn."""
+    statuses = iter(statuses)
+    return lambda handler: (next(statuses), {}, b'{}')
+
+
+class TestRetry:
+    """Test RetryPolicy and its use by RestClient."""
+
+    def test_backoff_capped(self):
+        policy = RetryPolicy(backoff_base=1, backoff_cap=5, jitter=False)
+        assert [policy.backoff(attempt) for attempt in range(1, 6)] == [1, 2, 4, 5, 5]
+        jittered = RetryPolicy(backoff_base=1, backoff_cap=5)
+        assert all(0 <= jittered.backoff(4) <= 5 for _ in range(100))
+        assert policy.backoff(1, retry_after="3") == 3
+
+    @pytest.mark.parametrize('method,status,expected', [
+        ("get", 503, True), ("put", 502, True), ("get", 404, False),
+        ("post", 503, False), ("patch", 503, False)])
+    def test_should_retry(self, method, status, expected):
+        assert RetryPolicy().should_retry(method, 1, status=status) is expected
+        assert RetryPolicy().should_retry(method, 3, status=status) is False
+
+    def test_rest_call_retries(self, http_server):
+        http_server.routes[("GET", "/user/x")] = flaky([503, 502, 200])
+        config = dict(EP_FQDN=http_server.url, shared_session=False,
+                      retry_policy=dict(max_attempts=4, backoff_base=0))
+        client = RestClient(config)
+        resp = client.rest_call("get", endpoint=http_server.url + "/user/x")
+        assert resp.status_code == 200 and resp.retries == 2
+        assert client.retry_stats.as_dict()["retries"] == 2
+        client.close()
+
+    def test_ttfb_of_last_attempt(self, http_server):
+        http_server.routes[("GET", "/user/x")] = flaky([503, 200])
+        config = dict(EP_FQDN=http_server.url, shared_session=False,
+                      retry_policy=dict(backoff_base=0.3, jitter=False))
+        client = RestClient(config)
+        resp = client.rest_call("get", endpoint=http_server.url + "/user/x")
+        assert resp.retries == 1 and resp.metrics.total >= 0.3
+        assert resp.metrics.ttfb < 0.3  # backoff sleep not included
+        client.close()
+
+    def test_rest_call_post_not_retried(self, http_server):
+        http_server.routes[("POST", "/user")] = flaky(itertools.repeat(503))
+        config = dict(EP_FQDN=http_server.url, shared_session=False,
+                      retry_policy=dict(backoff_base=0),
+                      retry_policies=dict(put=RetryPolicy(max_attempts=1)))
+        client = RestClient(config)
+        resp = client.rest_call("post", endpoint=http_server.url + "/user", data={})
+        assert resp.status_code == 503 and resp.retries == 0
+        assert client.retry_policy("put").max_attempts == 1
+        client.close()
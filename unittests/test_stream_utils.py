@@ -0,0 +1,74 @@
+"""Test incremental JSON parsing."""
+import json
+
+import pytest
+
+from commons.utils import stream_utils
+from commons.utils.stream_utils import iter_json_array
+
+
+def split(payload: bytes, size: int):
+    """Chunk payload in pieces of size bytes."""
+    return [payload[idx:idx + size] for idx in range(0, len(payload), size)]
+
+
+class TestStreamUtils:
+    """Test iter_json_array."""
+
+    items = [{"id": 1, "name": "döggie", "tags": [{"id": 2}]}, 12345, "x", None, [], {}]
+
+    @pytest.mark.parametrize('size', [1, 2, 3, 7, 1024])
+    def test_iter_json_array(self, size):
+        payload = json.dumps(self.items, indent=1).encode()
+        assert list(iter_json_array(split(payload, size))) == self.items
+
+    def test_iter_json_array_stops_early(self):
+        consumed = list()
+
+        def chunks():
+            for chunk in split(json.dumps(list(range(1000))).encode(), 16):
+                consumed.append(chunk)
+                yield chunk
+
+        for item in iter_json_array(chunks()):
+            if item == 5:
+                break
+        assert len(consumed) == 2
+
+    @pytest.mark.parametrize('payload', [b'{"a": 1}', b'[1, 2', b'[{"a": ]'])
+    def test_iter_json_array_invalid(self, payload):
+        with pytest.raises(ValueError):
+            list(iter_json_array(split(payload, 3)))
+
+    def test_empty_array(self):
+        assert list(iter_json_array([b" [ ", b"] "])) == []
+
+    @pytest.mark.parametrize('chunks, expected', [
+        ([b'[1.', b'5]'], [1.5]),
+        ([b'[1e', b'3]'], [1000.0]),
+        ([b'[12', b'34, tr', b'ue]'], [1234, True]),
+        ([b'["a', b'b"', b' ]'], ["ab"]),
+    ])
+    def test_split_values(self, chunks, expected):
+        assert list(iter_json_array(chunks)) == expected
+
+    @pytest.mark.parametrize('payload', [b'[1 2]', b'[,,1]', b'[1]garbage', b'[1,]', b'[1,,2]',
+                                         b'[1;2]', b'[', b'[1,'])
+    def test_malformed(self, payload):
+        for size in (1, len(payload)):
+            with pytest.raises(ValueError):
+                list(iter_json_array(split(payload, size)))
+
+    def test_large_item_few_parses(self, monkeypatch):
+        calls = list()
+        decode = stream_utils._DECODER.raw_decode
+
+        class Decoder:
+            def raw_decode(self, buf, pos):
+                calls.append(pos)
+                return decode(buf, pos)
+
+        monkeypatch.setattr(stream_utils, "_DECODER", Decoder())
+        payload = json.dumps(["x" * 100000]).encode()
+        assert list(iter_json_array(split(payload, 16))) == ["x" * 100000]
+        assert len(calls) < 20
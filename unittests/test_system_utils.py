@@ -0,0 +1,174 @@
+"""Test system utils caches and checksums."""
+import errno
+import hashlib
+import io
+import os
+import time
+
+import pytest
+from botocore.response import StreamingBody
+
+from commons.utils.system_utils import InMemoryDB
+from commons.utils.system_utils import LRUCache
+from commons.utils.system_utils import ShardedCache
+from commons.utils.system_utils import calc_checksum
+from commons.utils.system_utils import create_file
+from commons.utils.system_utils import create_files
+from commons.utils.system_utils import generate_file
+from commons.utils.system_utils import parse_size
+
+
+class TestLRUCache:
+    """Test LRUCache eviction, expiry and counters."""
+
+    def test_lookup_refreshes_recency(self):
+        cache = LRUCache(2)
+        cache.store("a", 1)
+        cache.store("b", 2)
+        assert cache.lookup("a") == 1
+        cache.store("c", 3)
+        assert list(cache.table) == ["a", "c"]
+        with pytest.raises(KeyError):
+            cache.lookup("b")
+        assert cache.stats() == dict(size=2, hits=1, misses=1, evictions=1)
+
+    def test_delete_and_restore(self):
+        cache = LRUCache(2)
+        cache.store("a", 1)
+        cache.delete("a")
+        cache.delete("missing")
+        cache.store("b", 2)
+        cache.store("a", 3)
+        cache.store("b", 4)
+        cache.store("c", 5)
+        assert cache.table == {"b": 4, "c": 5}
+
+    def test_ttl(self):
+        cache = LRUCache(10, ttl=0.05)
+        cache.store("short", 1)
+        cache.store("forever", 2, ttl=float("inf"))
+        cache.store("long", 3, ttl=60)
+        time.sleep(0.1)
+        with pytest.raises(KeyError):
+            cache.lookup("short")
+        assert cache.lookup("forever") == 2
+        assert cache.lookup("long") == 3
+        assert "short" not in cache.table
+
+
+class TestShardedCache:
+    """Test ShardedCache over LRUCache and InMemoryDB segments."""
+
+    def test_store_lookup_delete(self):
+        cache = ShardedCache(64, shards=4)
+        for idx in range(64):
+            cache.store(idx, idx * 2)
+        assert len(cache) == 64
+        assert cache.lookup(10) == 20
+        assert cache.peek(11) == 22
+        cache.delete(10)
+        with pytest.raises(KeyError):
+            cache.peek(10)
+        assert sorted(cache.get_keys()) == [idx for idx in range(64) if idx != 10]
+        assert cache.stats()["hits"] == 1
+
+    def test_pop_one(self):
+        cache = ShardedCache(16, shards=8, segment_cls=InMemoryDB)
+        cache.store("a", 1)
+        cache.store("b", 2)
+        assert sorted([cache.pop_one(), cache.pop_one()]) == [("a", 1), ("b", 2)]
+        assert cache.pop_one() == (False, False)
+
+
+class TestInMemoryDB:
+    """Test InMemoryDB random pop bookkeeping."""
+
+    def test_pop_peek_evict(self):
+        mem_db = InMemoryDB(4)
+        for idx in range(6):
+            mem_db.store(idx, str(idx))
+        mem_db.delete(3)
+        mem_db.store(4, "four")
+        assert sorted(mem_db._keys) == sorted(mem_db.table) == [2, 4, 5]
+        key, val = mem_db.peek_one()
+        assert mem_db.table[key] == val
+        popped = dict(mem_db.pop_one() for _ in range(3))
+        assert popped == {2: "2", 4: "four", 5: "5"}
+        assert mem_db.pop_one() == mem_db.peek_one() == (False, False)
+        assert mem_db._index == dict()
+
+
+class TestChecksum:
+    """Test calc_checksum over files and streams."""
+
+    def test_algorithms_and_paths(self, tmp_path):
+        data = os.urandom(3 * 1024 * 1024 + 17)
+        path = tmp_path / "blob"
+        path.write_bytes(data)
+        for use_mmap in (True, False):
+            assert calc_checksum(str(path), buf_size=65536, use_mmap=use_mmap) == \
+                hashlib.md5(data).hexdigest()
+        digests = calc_checksum(path, ["md5", "sha256", "blake2b"])
+        assert digests == {name: hashlib.new(name, data).hexdigest()
+                           for name in ("md5", "sha256", "blake2b")}
+        with open(path, "rb") as stream:
+            assert calc_checksum(stream, "sha1") == hashlib.sha1(data).hexdigest()
+        assert calc_checksum(StreamingBody(io.BytesIO(data), len(data)), "sha256") == \
+            hashlib.sha256(data).hexdigest()
+        empty = tmp_path / "empty"
+        empty.write_bytes(b"")
+        assert calc_checksum(str(empty)) == hashlib.md5(b"").hexdigest()
+        assert calc_checksum(str(tmp_path / "missing")) is None
+        with pytest.raises(NotImplementedError):
+            calc_checksum(str(path), "crc32")
+
+
+class TestGenerateFile:
+    """Test in process file generation."""
+
+    def test_contents(self, tmp_path):
+        path = str(tmp_path / "f")
+        digest = generate_file(path, "3K", "pattern", pattern=b"abc", hash_algo="md5",
+                               buf_size=1000)
+        with open(path, "rb") as out:
+            data = out.read()
+        assert data == b"abc" * 1024 and digest == hashlib.md5(data).hexdigest()
+        first = generate_file(path, 5000, "random", seed=7, hash_algo="sha1", buf_size=4096)
+        assert generate_file(path, 5000, "random", seed=7, hash_algo="sha1",
+                             buf_size=4096) == first == calc_checksum(path, "sha1")
+        for content in ("zero", "sparse", "alloc"):
+            digest = generate_file(path, 10000, content, hash_algo="md5")
+            assert digest == hashlib.md5(bytes(10000)).hexdigest() == calc_checksum(path)
+        with pytest.raises(ValueError):
+            generate_file(path, 1, "ones")
+
+    def test_parse_size(self):
+        assert [parse_size(size) for size in ("512", "4K", "1M", "1MiB", "1MB", "2gb", "3B")] == \
+            [512, 4096, 2 ** 20, 2 ** 20, 10 ** 6, 2 * 10 ** 9, 3]
+        with pytest.raises(ValueError):
+            parse_size("1XB")
+
+    def test_alloc_fallback(self, tmp_path, monkeypatch):
+        def unsupported(*args):
+            raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+        monkeypatch.setattr(os, "posix_fallocate", unsupported, raising=False)
+        path = str(tmp_path / "alloc")
+        generate_file(path, "10KB", "alloc")
+        with open(path, "rb") as out:
+            assert out.read() == bytes(10000)
+        digest = generate_file(path, 3000, "random", hash_algo="md5", buf_size=1024)
+        assert digest == calc_checksum(path) and os.path.getsize(path) == 3000
+
+    def test_create_file_and_files(self, tmp_path):
+        path = str(tmp_path / "dd")
+        assert create_file(path, 2, b_size="4K")[0]
+        assert os.path.getsize(path) == 8192
+        src = tmp_path / "src"
+        src.write_bytes(b"x" * 5000)
+        create_file(path, 3, dev=str(src), b_size="2K")
+        assert (tmp_path / "dd").read_bytes() == b"x" * 5000
+        paths = [str(tmp_path / "many{}".format(idx)) for idx in range(4)]
+        digests = create_files(paths, "2K", seed=1, hash_algo="md5", nworkers=2)
+        assert list(digests) == paths and len(set(digests.values())) == 4
+        assert digests[paths[2]] == calc_checksum(paths[2])
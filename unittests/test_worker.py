@@ -0,0 +1,273 @@
+"""Test worker pool."""
+import os
+import threading
+import time
+
+import pytest
+
+from commons.constants import NWORKERS
+from commons.exceptions import DeadlineExceeded
+from commons.worker import HYBRID
+from commons.worker import PRIORITY_BULK
+from commons.worker import PRIORITY_CRITICAL
+from commons.worker import PRIORITY_HEALTH
+from commons.worker import PROCESS
+from commons.worker import Workers
+from commons.worker import WorkQ
+from commons.worker import cpu_bound
+
+
+def square(num):
+    """Task failing for 13."""
+    if num == 13:
+        raise ValueError(num)
+    return num * num
+
+
+class TestWorkers:
+    """Test Workers futures API."""
+
+    def test_submit(self):
+        workers = Workers()
+        workers.start_workers(4)
+        with workers:
+            fs = [workers.submit(square, num) for num in range(20)]
+            assert [future.result() for future in fs if num_ok(future)] == \
+                [num * num for num in range(20) if num != 13]
+            assert isinstance(fs[13].exception(), ValueError)
+            done = list(workers.as_completed(fs))
+            assert len(done) == 20
+
+    def test_submit_after_shutdown(self):
+        workers = Workers()
+        workers.start_workers(2)
+        workers.end_workers()
+        with pytest.raises(RuntimeError):
+            workers.submit(pow, 2, 3)
+        with pytest.raises(RuntimeError):
+            workers.map(pow, [2], [3])
+        assert workers.w_workq.qsize() == 0
+        workers = Workers(PROCESS)
+        workers.start_workers(1)
+        workers.end_workers()
+        with pytest.raises(RuntimeError):
+            workers.submit(pow, 2, 3)
+
+    def test_map(self):
+        workers = Workers()
+        workers.start_workers(3)
+        with workers:
+            assert list(workers.map(square, range(10))) == [num * num for num in range(10)]
+            results = workers.map(square, range(20))
+            with pytest.raises(ValueError):
+                list(results)
+
+    def test_worker_survives_failure(self):
+        workers = Workers()
+        workers.start_workers(1)
+        with workers:
+            wq = WorkQ(square, 0)
+            wq.put(13)
+            workers.wenque(wq)
+            assert workers.submit(square, 2).result(timeout=5) == 4
+            assert all(thread.is_alive() for thread in workers.w_workers)
+
+
+def num_ok(future):
+    """Check future did not fail."""
+    return future.exception() is None
+
+
+def record(path):
+    """Task appending its pid to the file at path."""
+    with open(path, "a") as out:
+        out.write("{}\n".format(os.getpid()))
+
+
+@cpu_bound
+def cube(num):
+    """CPU bound task."""
+    return num ** 3, os.getpid()
+
+
+class TestProcessBackend:
+    """Test process and hybrid Workers backends."""
+
+    def test_process_submit_map(self):
+        workers = Workers(PROCESS)
+        workers.start_workers(2, chunksize=4)
+        with workers:
+            assert workers.submit(square, 3).result(timeout=30) == 9
+            assert isinstance(workers.submit(square, 13).exception(timeout=30), ValueError)
+            assert list(workers.map(square, range(10))) == [num * num for num in range(10)]
+            with pytest.raises(TypeError):
+                workers.submit(lambda: None)
+            # arguments are pickled once, on the way to the process
+            assert isinstance(workers.submit(square, threading.Lock()).exception(timeout=30),
+                              TypeError)
+        assert workers.w_executor is None
+
+    def test_process_wenque_chunks(self, tmp_path):
+        out = str(tmp_path / "pids")
+        workers = Workers(PROCESS)
+        workers.start_workers(2, record, chunksize=8)
+        for _ in range(20):
+            workers.wenque(out)
+        workers.end_workers()
+        with open(out) as pids:
+            lines = pids.read().split()
+        assert len(lines) == 20
+        assert str(os.getpid()) not in lines
+
+    def test_hybrid_routing(self):
+        with Workers(HYBRID) as workers:
+            assert workers.submit(cube, 2).result(timeout=30)[1] != os.getpid()
+            assert workers.submit(square, 2).result(timeout=5) == 4
+            assert [res for res, _ in workers.map(cube, range(3))] == [0, 1, 8]
+
+    def test_bad_backend(self):
+        with pytest.raises(ValueError):
+            Workers("fiber")
+
+
+class TestAutoscale:
+    """Test autoscaling thread pool."""
+
+    def test_grow_and_shrink(self):
+        release = threading.Event()
+        workers = Workers()
+        workers.start_workers(1, release.wait, batch_size=1, max_workers=4,
+                              idle_timeout=0.2, target_wait=0.05)
+        for _ in range(8):
+            workers.wenque(5)
+        assert workers.metrics()["pool_size"] == 4
+        release.set()
+        workers.w_workq.join()
+        deadline = time.monotonic() + 5
+        while workers.metrics()["pool_size"] > 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        metrics = workers.metrics()
+        workers.end_workers()
+        assert metrics["pool_size"] == 1
+        assert metrics["queue_depth"] == 0
+        assert metrics["tasks"] == 8
+        assert metrics["grown"] == 3 and metrics["shrunk"] == 3
+        assert metrics["wait_max"] >= metrics["wait_avg"] > 0
+
+    def test_fixed_size(self):
+        with Workers() as workers:
+            list(workers.map(square, range(12)))
+            assert workers.metrics()["pool_size"] == NWORKERS
+        assert workers.metrics()["tasks"] == 12
+
+
+class TestPriority:
+    """Test priority and deadline scheduling."""
+
+    def test_priority_order(self):
+        gate, order = threading.Event(), list()
+        workers = Workers()
+        workers.start_workers(1, order.append, batch_size=1, maxsize=0)
+        workers.submit(gate.wait, 5)
+        time.sleep(0.1)
+        workers.wenque("bulk", PRIORITY_BULK)
+        workers.wenque("normal")
+        workers.wenque("health", PRIORITY_HEALTH)
+        workers.wenque("teardown", PRIORITY_CRITICAL)
+        workers.wenque("bulk2", PRIORITY_BULK)
+        gate.set()
+        workers.end_workers()
+        assert order == ["teardown", "health", "normal", "bulk", "bulk2"]
+
+    def test_deadline(self):
+        gate, done = threading.Event(), list()
+        workers = Workers()
+        workers.start_workers(1, done.append, batch_size=1, maxsize=0)
+        workers.submit(gate.wait, 5)
+        time.sleep(0.1)
+        late = workers.submit_task(square, (2,), deadline=0.01)
+        ontime = workers.submit_task(square, (3,), deadline=30)
+        workers.wenque("stale", deadline=0.01)
+        time.sleep(0.05)
+        gate.set()
+        with pytest.raises(DeadlineExceeded):
+            late.result(timeout=5)
+        assert ontime.result(timeout=5) == 9
+        workers.end_workers()
+        assert done == []
+        metrics = workers.metrics()
+        assert metrics["dropped"] == 2
+        assert [item for item, _ in metrics["drops"]] == [(square, (2,)), "stale"]
+        assert "deadline exceeded" in metrics["drops"][1][1]
+
+    def test_urgent_put_skips_bound(self):
+        gate, order = threading.Event(), list()
+        workers = Workers()
+        workers.start_workers(1, order.append, batch_size=1, maxsize=1)
+        workers.submit(gate.wait, 5)
+        time.sleep(0.1)
+        workers.wenque("bulk", PRIORITY_BULK)
+        producer = threading.Thread(target=workers.wenque, args=("bulk2", PRIORITY_BULK))
+        producer.start()
+        time.sleep(0.1)
+        assert producer.is_alive()  # blocked on the full queue
+        urgent = threading.Thread(target=workers.wenque, args=("teardown", PRIORITY_CRITICAL))
+        urgent.start()
+        urgent.join(1)
+        assert not urgent.is_alive()
+        gate.set()
+        producer.join(5)
+        workers.end_workers()
+        assert order == ["teardown", "bulk", "bulk2"]
+
+
+class TestWorkQ:
+    """Test WorkQ backpressure, batching and shutdown."""
+
+    def test_put_blocks_while_full(self):
+        workq = WorkQ(maxsize=2)
+        workq.put_many([1, 2])
+        producer = threading.Thread(target=workq.put, args=(3,))
+        producer.start()
+        producer.join(0.2)
+        assert producer.is_alive() and workq.qsize() == 2
+        assert workq.get() == 1
+        producer.join(5)
+        assert not producer.is_alive() and workq.qsize() == 2
+
+    def test_put_many_fills_free_slots(self):
+        workq = WorkQ(maxsize=3)
+        producer = threading.Thread(target=workq.put_many, args=(range(5),))
+        producer.start()
+        taken = list()
+        while len(taken) < 5:
+            taken += workq.get_batch(2, timeout=5)
+        producer.join(5)
+        assert taken == list(range(5))
+
+    def test_get_batch_fair_share(self):
+        workq = WorkQ()
+        workq.consumers = 4
+        workq.put_many(range(8))
+        assert workq.get_batch(8) == [0, 1]
+        assert workq.get_batch(8) == [2]
+        workq.consumers = 1
+        assert workq.get_batch(8) == [3, 4, 5, 6, 7]
+        assert workq.get_batch(8, timeout=0.01) == []
+
+    def test_close_and_join(self):
+        workq = WorkQ()
+        workq.put_many(range(3))
+        done = threading.Event()
+        joiner = threading.Thread(target=lambda: (workq.join(), done.set()))
+        joiner.start()
+        batch = workq.get_batch(3)
+        workq.task_done(2)
+        assert not done.wait(0.1)
+        workq.task_done()
+        assert done.wait(5)
+        consumer = threading.Thread(target=lambda: batch.append(workq.get_batch(1)))
+        consumer.start()
+        workq.close()
+        consumer.join(5)
+        assert workq.closed and batch[-1] == []